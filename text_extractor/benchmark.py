@@ -0,0 +1,214 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+import script
+from profiling import STAGES, read_metrics
+
+# Folder with the bundled collection images
+BUNDLED_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'A')
+
+# Synthetic page sizes: a letter page scanned at about 100, 200, 300 and 600 dpi
+DEFAULT_SIZES = '850x1100,1700x2200,2550x3300,5100x6600'
+
+# Words used to fill the synthetic pages
+SYNTHETIC_WORDS = (
+    "the county company water wheel engine school railroad station river valley mountain "
+    "street church office building harvest timber mining record letter photograph family "
+    "bridge house north south between during several written printed account public"
+).split()
+
+
+# Function to get the current commit, so results can be compared across commits
+def current_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f"{commit}-dirty" if dirty else commit
+
+# Function to draw a synthetic text page; the same seed always gives the same page
+def make_synthetic_page(width, height, seed):
+    rng = random.Random(seed)
+    page = np.full((height, width), 235, dtype=np.uint8)
+
+    # Scale the font with the page width, as if the same page was scanned at a different resolution
+    font_scale = width / 1100
+    thickness = max(int(round(font_scale * 2)), 1)
+    line_height = int(40 * font_scale)
+    margin = int(60 * font_scale)
+    y = margin + line_height
+    while y < height - margin:
+        words = [rng.choice(SYNTHETIC_WORDS) for _ in range(rng.randint(4, 9))]
+        cv2.putText(page, ' '.join(words), (margin, y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, 20, thickness, cv2.LINE_AA)
+        y += line_height
+
+    # Add a little scanner noise
+    cv2.setRNGSeed(seed)
+    noise = np.empty(page.shape, dtype=np.int16)
+    cv2.randn(noise, 0, 8)
+    noise += page
+    np.clip(noise, 0, 255, out=noise)
+    return noise.astype(np.uint8)
+
+# Function to write the synthetic pages for every size, returning {dataset name: folder}
+def generate_synthetic_images(workdir, sizes, images_per_size):
+    datasets = {}
+    for size in sizes:
+        width, height = (int(v) for v in size.split('x'))
+        folder = os.path.join(workdir, f"synthetic_{size}")
+        os.makedirs(folder, exist_ok=True)
+        for i in range(images_per_size):
+            cv2.imwrite(os.path.join(folder, f"page_{i}.png"), make_synthetic_page(width, height, seed=i))
+        datasets[f"synthetic_{size}"] = folder
+    return datasets
+
+# Function to get a percentile of a list of values
+def percentile(values, pct):
+    if not values:
+        return None
+    return float(np.percentile(values, pct))
+
+# Function to run process_images on one folder `repeat` times and summarize throughput, latency and memory
+def run_dataset(input_folder, workdir, workers, repeat):
+    latencies, wall_times, peaks = [], [], []
+    stage_latencies = {stage: [] for stage in STAGES}
+    images = 0
+    for i in range(repeat):
+        output_folder = os.path.join(workdir, f"output_{i}")
+        script.process_images(input_folder, output_folder, 'transcriptions.csv', workers=workers,
+                              use_cache=False, metrics_file='metrics.jsonl')
+        records, summary = read_metrics(os.path.join(output_folder, 'metrics.jsonl'))
+        shutil.rmtree(output_folder)
+
+        images = summary['images']
+        wall_times.append(summary['wall_time'])
+        for record in records:
+            latencies.append(record['total'])
+            for stage, seconds in record['stages'].items():
+                stage_latencies.setdefault(stage, []).append(seconds)
+            # The process peak covers the images measured per image too
+            if record.get('process_peak_rss_mb') is not None:
+                peaks.append(record['process_peak_rss_mb'])
+        if summary.get('main_peak_rss_mb') is not None:
+            peaks.append(summary['main_peak_rss_mb'])
+
+    wall_time = statistics.median(wall_times)
+    return {
+        'images': images,
+        'wall_time': wall_time,
+        'throughput': images / wall_time if wall_time else None,
+        'latency': {f"p{pct}": percentile(latencies, pct) for pct in (50, 90, 99)},
+        'stage_p50': {stage: percentile(values, 50) for stage, values in stage_latencies.items() if values},
+        'peak_rss_mb': max(peaks) if peaks else None,
+    }
+
+# Function to compare results with a baseline, returning the list of regressions beyond `threshold`
+def compare_results(results, baseline, threshold):
+    regressions = []
+    for name, current in results['datasets'].items():
+        previous = baseline.get('datasets', {}).get(name)
+        if not previous:
+            continue
+        checks = [
+            ('latency p50', current['latency']['p50'], previous['latency']['p50'], True),
+            ('latency p90', current['latency']['p90'], previous['latency']['p90'], True),
+            ('throughput', current['throughput'], previous['throughput'], False),
+        ]
+        for label, now, before, lower_is_better in checks:
+            if not now or not before:
+                continue
+            change = (now - before) / before
+            print(f"  {name:<24} {label:<12} {before:10.4f} -> {now:10.4f} ({change:+.1%})")
+            if (change > threshold) if lower_is_better else (change < -threshold):
+                regressions.append(f"{name} {label} {change:+.1%}")
+    return regressions
+
+# Function to print the results as a table
+def print_results(results):
+    print(f"\nCommit {results['commit']} | backend {results['environment']['ocr_backend']} | workers {results['workers']}")
+    print(f"{'dataset':<24} {'images':>6} {'img/s':>8} {'p50 s':>8} {'p90 s':>8} {'p99 s':>8} {'peak MB':>8}")
+    for name, result in results['datasets'].items():
+        latency = result['latency']
+        print(f"{name:<24} {result['images']:>6} {result['throughput'] or 0:>8.2f} {latency['p50'] or 0:>8.3f} "
+              f"{latency['p90'] or 0:>8.3f} {latency['p99'] or 0:>8.3f} {result['peak_rss_mb'] or 0:>8.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark process_images on the bundled images and synthetic pages.")
+    parser.add_argument('--workers', type=int, default=1, help="worker processes (default 1, for stable numbers)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per dataset (default 3)")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f"synthetic page sizes (default {DEFAULT_SIZES})")
+    parser.add_argument('--images-per-size', type=int, default=3, help="synthetic pages per size (default 3)")
+    parser.add_argument('--no-bundled', action='store_true', help="skip the bundled A/ images")
+    parser.add_argument('--no-synthetic', action='store_true', help="skip the synthetic pages")
+    parser.add_argument('--output', help="results file (default benchmark_results/<commit>.json)")
+    parser.add_argument('--compare', help="baseline results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="allowed slowdown before failing (default 0.10)")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='text_extractor_bench_')
+    try:
+        datasets = {}
+        if not args.no_bundled:
+            datasets['bundled_A'] = BUNDLED_FOLDER
+        if not args.no_synthetic:
+            datasets.update(generate_synthetic_images(workdir, args.sizes.split(','), args.images_per_size))
+
+        results = {
+            'commit': current_commit(),
+            'workers': args.workers,
+            'repeat': args.repeat,
+            'environment': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'opencv': cv2.__version__,
+                'numpy': np.__version__,
+                'ocr_backend': script.get_ocr_backend().name,
+            },
+            'datasets': {},
+        }
+        # Each dataset runs in a fresh process, so peak memory is not carried over from earlier datasets
+        context = multiprocessing.get_context('spawn')
+        for name, folder in datasets.items():
+            print(f"Benchmarking {name}...")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as runner:
+                future = runner.submit(run_dataset, folder, os.path.join(workdir, name), args.workers, args.repeat)
+                results['datasets'][name] = future.result()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_results(results)
+
+    output = args.output or os.path.join('benchmark_results', f"{results['commit']}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved benchmark results to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {baseline.get('commit', args.compare)}:")
+        regressions = compare_results(results, baseline, args.threshold)
+        if regressions:
+            print("Regressions: " + ', '.join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import hashlib
+import os
+
+import numpy as np
+
+# Only words of these lengths survive filter_recognized_words, so only they are indexed
+MIN_WORD_LENGTH = 3
+MAX_WORD_LENGTH = 15
+
+# Default location of the prebuilt word index, next to this file
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dictionary_index.npy')
+
+
+# Function to build the compact word index from the SpellChecker word list.
+# The index is a sorted array of fixed-width lowercase ASCII words saved as .npy, so it can be
+# memory-mapped and shared between processes instead of parsing the frequency JSON every time.
+def build_word_index(path=INDEX_PATH, language='en'):
+    from spellchecker import SpellChecker
+
+    words = {
+        word.lower()
+        for word in SpellChecker(language=language).word_frequency.keys()
+        if MIN_WORD_LENGTH <= len(word) <= MAX_WORD_LENGTH and word.isascii()
+    }
+    index = np.array(sorted(word.encode('ascii') for word in words), dtype=f'S{MAX_WORD_LENGTH}')
+
+    # Write to a temporary file first so a reader never sees a half-written index
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, index)
+    os.replace(tmp_path, path)
+    return path
+
+# Function to read a custom vocabulary file: one word per line, '#' starts a comment
+def load_vocabulary(paths):
+    vocabulary = set()
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                word = line.split('#', 1)[0].strip()
+                if word:
+                    vocabulary.add(word.lower())
+    return vocabulary
+
+
+# Memory-mapped dictionary of known words plus a custom collection vocabulary (place names and
+# the like), checked in batches with a binary search over the sorted index.
+class WordIndex:
+    def __init__(self, path=INDEX_PATH, vocabulary=()):
+        self.words = np.load(path, mmap_mode='r')
+        # Rebuilding the index (e.g. after a pyspellchecker upgrade) can change which words are known
+        self.index_hash = hashlib.sha256(self.words).hexdigest()
+        self.vocabulary = {word.lower() for word in vocabulary}
+        self.vocabulary_hash = hashlib.sha256('\n'.join(sorted(self.vocabulary)).encode('utf-8')).hexdigest()
+
+    # Return, for each token, whether it is a known word (case-insensitive)
+    def contains_many(self, tokens):
+        if not tokens:
+            return []
+        lowered = [token.lower() for token in tokens]
+        keys = np.array(
+            [token.encode('ascii', 'replace') if len(token) <= MAX_WORD_LENGTH else b'' for token in lowered],
+            dtype=f'S{MAX_WORD_LENGTH}',
+        )
+        found = np.zeros(len(keys), dtype=bool)
+        if len(self.words):
+            positions = np.minimum(np.searchsorted(self.words, keys), len(self.words) - 1)
+            found = (self.words[positions] == keys) & (keys != b'')
+        return [bool(hit) or token in self.vocabulary for hit, token in zip(found, lowered)]
+
+    def __contains__(self, word):
+        return self.contains_many([word])[0]
+
+
+if __name__ == "__main__":
+    print(f"Saved dictionary index to {build_word_index()}")
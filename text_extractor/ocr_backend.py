@@ -0,0 +1,162 @@
+import re
+import shlex
+
+import numpy as np
+import pytesseract
+
+try:
+    import tesserocr
+except ImportError:  # tesserocr is optional; pytesseract is used instead
+    tesserocr = None
+
+
+# Function to split a Tesseract command-line config string into (psm, oem, variables)
+def parse_tesseract_config(config):
+    psm, oem, variables = None, None, {}
+    args = shlex.split(config or '')
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == '--psm' and i + 1 < len(args):
+            psm = int(args[i + 1])
+            i += 1
+        elif arg == '--oem' and i + 1 < len(args):
+            oem = int(args[i + 1])
+            i += 1
+        elif arg == '-c' and i + 1 < len(args) and '=' in args[i + 1]:
+            name, value = args[i + 1].split('=', 1)
+            variables[name] = value
+            i += 1
+        i += 1
+    return psm, oem, variables
+
+
+# Function to replace the page segmentation mode in a Tesseract config string
+def config_with_psm(config, psm):
+    if psm is None:
+        return config
+    config = re.sub(r'--psm\s+\d+', '', config or '').strip()
+    return f"{config} --psm {psm}".strip()
+
+# Function to build a word record: its text, confidence (0-100) and box in image coordinates
+def make_word(text, conf, left, top, width, height, line):
+    return {'text': text, 'conf': float(conf), 'left': int(left), 'top': int(top),
+            'width': int(width), 'height': int(height), 'line': line}
+
+
+# OCR backend that runs the tesseract executable through pytesseract.
+# Every call writes the image to a temp file and starts a new tesseract process.
+class PytesseractBackend:
+    name = 'pytesseract'
+    persistent = False
+
+    def __init__(self, lang, config):
+        self.lang = lang
+        self.config = config
+
+    def image_to_string(self, img):
+        return pytesseract.image_to_string(img, lang=self.lang, config=self.config).strip()
+
+    # Return the recognized words with their confidences, optionally with another page segmentation mode
+    def image_to_data(self, img, psm=None):
+        data = pytesseract.image_to_data(
+            img, lang=self.lang, config=config_with_psm(self.config, psm), output_type=pytesseract.Output.DICT
+        )
+        words = []
+        for i, text in enumerate(data['text']):
+            conf = float(data['conf'][i])
+            if conf < 0 or not text.strip():
+                continue
+            line = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            words.append(make_word(text.strip(), conf, data['left'][i], data['top'][i],
+                                   data['width'][i], data['height'][i], line))
+        return words
+
+    def close(self):
+        pass
+
+
+# OCR backend that keeps one libtesseract engine loaded in the process through tesserocr.
+# The traineddata is loaded once, and images are handed over from memory.
+class TesserocrBackend:
+    name = 'tesserocr'
+    persistent = True
+
+    def __init__(self, lang, config, tessdata_path=None):
+        psm, oem, variables = parse_tesseract_config(config)
+        kwargs = {'lang': lang}
+        if tessdata_path:
+            kwargs['path'] = tessdata_path
+        if psm is not None:
+            kwargs['psm'] = psm
+        if oem is not None:
+            kwargs['oem'] = oem
+        if variables:
+            kwargs['variables'] = variables
+        self.api = tesserocr.PyTessBaseAPI(**kwargs)
+        self.psm = self.api.GetPageSegMode()
+
+    # Pass the grayscale buffer directly, without writing a temp image file
+    def set_image(self, img, psm=None):
+        img = np.ascontiguousarray(img, dtype=np.uint8)
+        if img.ndim == 2:
+            height, width = img.shape
+            bytes_per_pixel = 1
+        else:
+            height, width, bytes_per_pixel = img.shape
+        self.api.SetPageSegMode(self.psm if psm is None else psm)
+        self.api.SetImageBytes(img.tobytes(), width, height, bytes_per_pixel, width * bytes_per_pixel)
+
+    def image_to_string(self, img):
+        self.set_image(img)
+        try:
+            return self.api.GetUTF8Text().strip()
+        finally:
+            self.api.Clear()
+
+    # Return the recognized words with their confidences, optionally with another page segmentation mode
+    def image_to_data(self, img, psm=None):
+        self.set_image(img, psm)
+        words = []
+        try:
+            self.api.Recognize()
+            iterator = self.api.GetIterator()
+            line = 0
+            for word in tesserocr.iterate_level(iterator, tesserocr.RIL.WORD):
+                text = (word.GetUTF8Text(tesserocr.RIL.WORD) or '').strip()
+                if not text:
+                    continue
+                if word.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                    line += 1
+                left, top, right, bottom = word.BoundingBox(tesserocr.RIL.WORD)
+                words.append(make_word(text, word.Confidence(tesserocr.RIL.WORD),
+                                       left, top, right - left, bottom - top, line))
+        finally:
+            self.api.Clear()
+        return words
+
+    def close(self):
+        self.api.End()
+
+
+# Function to create an OCR backend by name: 'tesserocr', 'pytesseract' or 'auto'.
+# 'auto' prefers the in-process engine and falls back to pytesseract when it is unavailable.
+def create_ocr_backend(name, lang, config, tessdata_path=None):
+    if name == 'pytesseract':
+        return PytesseractBackend(lang, config)
+
+    if name not in ('auto', 'tesserocr'):
+        raise ValueError(f"Unknown OCR backend: {name}")
+
+    if tesserocr is None:
+        if name == 'tesserocr':
+            raise RuntimeError("The tesserocr backend requires the tesserocr package")
+        return PytesseractBackend(lang, config)
+
+    try:
+        return TesserocrBackend(lang, config, tessdata_path)
+    except RuntimeError as e:
+        if name == 'tesserocr':
+            raise
+        print(f"Could not start the tesserocr engine ({e}); falling back to pytesseract")
+        return PytesseractBackend(lang, config)
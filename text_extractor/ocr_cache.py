@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# Default upper bound for the on-disk cache (512 MB)
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Function to hash the content of an image file
+def hash_file(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Function to build the cache key from the image content and the settings that affect OCR output
+def make_cache_key(content_hash, settings):
+    settings_json = json.dumps(settings, sort_keys=True)
+    return hashlib.sha256(f"{content_hash}:{settings_json}".encode('utf-8')).hexdigest()
+
+
+# Persistent OCR result cache stored in a SQLite database.
+#
+# Raw OCR text is stored separately from the filtered text, so changing
+# filter_recognized_words (and bumping its version) reuses the raw OCR
+# instead of running Tesseract again. Text-region boxes are stored under
+# their own key (content plus preprocessing and detection settings), so they
+# are reused when only the OCR settings change. Entries are evicted least
+# recently used first once the stored data exceeds max_bytes.
+#
+# The checkpoint table records finished rows for a run, so an interrupted
+# run picks up where it stopped without re-hashing or re-OCRing those files.
+class OCRCache:
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(os.path.join(cache_dir, 'ocr_cache.sqlite3'))
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS ocr (
+                key TEXT PRIMARY KEY,
+                raw_text TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ocr_last_used ON ocr (last_used);
+            CREATE TABLE IF NOT EXISTS filtered (
+                key TEXT NOT NULL,
+                filter_version TEXT NOT NULL,
+                text TEXT NOT NULL,
+                PRIMARY KEY (key, filter_version)
+            );
+            CREATE TABLE IF NOT EXISTS regions (
+                key TEXT PRIMARY KEY,
+                boxes TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS checkpoint (
+                run TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                row TEXT NOT NULL,
+                PRIMARY KEY (run, path)
+            );
+        """)
+        self.total_bytes = self.conn.execute(
+            'SELECT (SELECT COALESCE(SUM(size), 0) FROM ocr) + (SELECT COALESCE(SUM(size), 0) FROM regions)'
+        ).fetchone()[0]
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Return the raw OCR text for a key, or None on a miss
+    def get_raw(self, key):
+        found = self.conn.execute('SELECT raw_text FROM ocr WHERE key = ?', (key,)).fetchone()
+        if found is None:
+            return None
+        self.conn.execute('UPDATE ocr SET last_used = ? WHERE key = ?', (time.time(), key))
+        return found[0]
+
+    # Return the filtered text for a key and filter version, or None on a miss
+    def get_filtered(self, key, filter_version):
+        found = self.conn.execute(
+            'SELECT text FROM filtered WHERE key = ? AND filter_version = ?',
+            (key, str(filter_version)),
+        ).fetchone()
+        return found[0] if found else None
+
+    # Store raw OCR text (and optionally its filtered text) for a key
+    def put(self, key, raw_text, filter_version=None, filtered_text=None):
+        size = len(raw_text.encode('utf-8'))
+        previous = self.conn.execute('SELECT size FROM ocr WHERE key = ?', (key,)).fetchone()
+        if previous:
+            self.total_bytes -= previous[0]
+            # Filtered text of the old raw text is stale
+            self.conn.execute('DELETE FROM filtered WHERE key = ?', (key,))
+        self.conn.execute(
+            'INSERT OR REPLACE INTO ocr (key, raw_text, size, last_used) VALUES (?, ?, ?, ?)',
+            (key, raw_text, size, time.time()),
+        )
+        self.total_bytes += size
+        if filtered_text is not None:
+            self.put_filtered(key, filter_version, filtered_text)
+        self.evict()
+        self.conn.commit()
+
+    # Store the filtered text for a key under a filter version.
+    # Only the current filter version is kept, and its size counts towards the OCR entry it belongs to.
+    def put_filtered(self, key, filter_version, filtered_text):
+        entry = self.conn.execute('SELECT size, LENGTH(CAST(raw_text AS BLOB)) FROM ocr WHERE key = ?', (key,)).fetchone()
+        if entry is None:
+            # Filtered text is evicted together with its raw OCR text, so there is nothing to attach it to
+            return
+        self.conn.execute('DELETE FROM filtered WHERE key = ?', (key,))
+        self.conn.execute(
+            'INSERT INTO filtered (key, filter_version, text) VALUES (?, ?, ?)',
+            (key, str(filter_version), filtered_text),
+        )
+        size = entry[1] + len(filtered_text.encode('utf-8'))
+        self.conn.execute('UPDATE ocr SET size = ? WHERE key = ?', (size, key))
+        self.total_bytes += size - entry[0]
+        self.evict()
+
+    # Return the text-region boxes for a key, or None on a miss
+    def get_regions(self, key):
+        found = self.conn.execute('SELECT boxes FROM regions WHERE key = ?', (key,)).fetchone()
+        if found is None:
+            return None
+        self.conn.execute('UPDATE regions SET last_used = ? WHERE key = ?', (time.time(), key))
+        return json.loads(found[0])
+
+    # Store the text-region boxes for a key
+    def put_regions(self, key, boxes):
+        boxes_json = json.dumps(boxes)
+        previous = self.conn.execute('SELECT size FROM regions WHERE key = ?', (key,)).fetchone()
+        if previous:
+            self.total_bytes -= previous[0]
+        self.conn.execute(
+            'INSERT OR REPLACE INTO regions (key, boxes, size, last_used) VALUES (?, ?, ?, ?)',
+            (key, boxes_json, len(boxes_json), time.time()),
+        )
+        self.total_bytes += len(boxes_json)
+        self.evict()
+        self.conn.commit()
+
+    # Remove least recently used entries until the cache fits in max_bytes
+    def evict(self):
+        while self.total_bytes > self.max_bytes:
+            oldest = self.conn.execute(
+                "SELECT 'ocr', key, size, last_used FROM ocr "
+                "UNION ALL SELECT 'regions', key, size, last_used FROM regions "
+                "ORDER BY last_used LIMIT 64"
+            ).fetchall()
+            if not oldest:
+                self.total_bytes = 0
+                break
+            for table, key, size, _ in oldest:
+                if table == 'ocr':
+                    self.conn.execute('DELETE FROM ocr WHERE key = ?', (key,))
+                    self.conn.execute('DELETE FROM filtered WHERE key = ?', (key,))
+                else:
+                    self.conn.execute('DELETE FROM regions WHERE key = ?', (key,))
+                self.total_bytes -= size
+                if self.total_bytes <= self.max_bytes:
+                    break
+
+    # Return the rows already finished for a run, keyed by path, skipping files changed since
+    def load_checkpoint(self, run):
+        done = {}
+        for path, size, mtime_ns, row in self.conn.execute(
+            'SELECT path, size, mtime_ns, row FROM checkpoint WHERE run = ?', (run,)
+        ):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if stat.st_size == size and stat.st_mtime_ns == mtime_ns:
+                done[path] = json.loads(row)
+        return done
+
+    # Return the row finished for a path in a run, or None if there is none or the file changed since
+    def get_checkpoint(self, run, path):
+        found = self.conn.execute(
+            'SELECT size, mtime_ns, row FROM checkpoint WHERE run = ? AND path = ?', (run, path)
+        ).fetchone()
+        if found is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if stat.st_size != found[0] or stat.st_mtime_ns != found[1]:
+            return None
+        return json.loads(found[2])
+
+    # Record a finished row for a run
+    def save_checkpoint(self, run, path, row):
+        stat = os.stat(path)
+        self.conn.execute(
+            'INSERT OR REPLACE INTO checkpoint (run, path, size, mtime_ns, row) VALUES (?, ?, ?, ?, ?)',
+            (run, path, stat.st_size, stat.st_mtime_ns, json.dumps(row)),
+        )
+        self.conn.commit()
+
+    # Forget the checkpoint of a run once it has completed
+    def clear_checkpoint(self, run):
+        self.conn.execute('DELETE FROM checkpoint WHERE run = ?', (run,))
+        self.conn.commit()
@@ -0,0 +1,140 @@
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows; peak memory is then not reported
+    resource = None
+
+# Stages of the pipeline, in the order they run for one image
+STAGES = ('lookup', 'decode', 'preprocess', 'detect', 'ocr', 'filter')
+
+
+# Function to get the peak resident memory of the current process in MB, or None when unknown
+def peak_memory_mb():
+    # On Linux, VmHWM is the peak of this process image; ru_maxrss would include the parent's
+    # peak for processes started with fork and exec
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+# Highest peak seen before the last reset_peak_memory() call
+peak_before_reset_mb = None
+
+# Function to start measuring the peak memory afresh, so the next peak_memory_mb() covers only the
+# work done since. Returns False where the peak cannot be reset (outside Linux).
+def reset_peak_memory():
+    global peak_before_reset_mb
+    peak = peak_memory_mb()
+    try:
+        # Writing 5 to clear_refs resets VmHWM to the current resident size
+        with open('/proc/self/clear_refs', mode='w', encoding='ascii') as f:
+            f.write('5')
+    except OSError:
+        return False
+    if peak is not None:
+        peak_before_reset_mb = max(peak, peak_before_reset_mb or 0.0)
+    return True
+
+# Function to get the peak resident memory of the current process over its whole lifetime in MB,
+# including the peaks from before reset_peak_memory() calls
+def process_peak_memory_mb():
+    peak = peak_memory_mb()
+    if peak is None or peak_before_reset_mb is None:
+        return peak
+    return max(peak, peak_before_reset_mb)
+
+
+# Collects wall-clock time per named stage
+class StageTimer:
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def total(self):
+        return sum(self.timings.values())
+
+
+# Writes one JSON line of stage timings and memory per image, then a summary line for the run.
+# peak_rss_mb is the peak while that image was processed (None where it cannot be measured per image);
+# process_peak_rss_mb is the lifetime peak of the process that processed it.
+class MetricsWriter:
+    def __init__(self, path):
+        self.file = open(path, mode='w', encoding='utf-8')
+        self.run_timer = StageTimer()
+        self.totals = {}
+        self.images = 0
+        self.started = time.perf_counter()
+
+    # Record the metrics of one image; source says where the row came from ('ocr', 'cache' or 'checkpoint')
+    def record(self, filename, source, timings, peak_mb=None, process_peak_mb=None):
+        timings = {stage: round(seconds, 6) for stage, seconds in timings.items()}
+        for stage, seconds in timings.items():
+            self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+        self.images += 1
+        record = {
+            'filename': filename,
+            'source': source,
+            'stages': timings,
+            'total': round(sum(timings.values()), 6),
+            'peak_rss_mb': peak_mb,
+            'process_peak_rss_mb': process_peak_mb,
+        }
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    # Time a stage of the whole run, such as writing or sorting the CSV
+    def stage(self, name):
+        return self.run_timer.stage(name)
+
+    def close(self):
+        totals = dict(self.totals)
+        totals.update(self.run_timer.timings)
+        summary = {
+            'summary': True,
+            'images': self.images,
+            'wall_time': round(time.perf_counter() - self.started, 6),
+            'stage_totals': {stage: round(seconds, 6) for stage, seconds in totals.items()},
+            'main_peak_rss_mb': process_peak_memory_mb(),
+        }
+        self.file.write(json.dumps(summary) + '\n')
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Function to read the per-image records and the summary back from a metrics file
+def read_metrics(path):
+    records, summary = [], None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get('summary'):
+                summary = record
+            else:
+                records.append(record)
+    return records, summary
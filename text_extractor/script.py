@@ -3,33 +3,220 @@ import pytesseract
 import cv2
 import numpy as np
 import csv
-from spellchecker import SpellChecker
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 import re
+import threading
+from PIL import Image
+from dictionary import INDEX_PATH, WordIndex, build_word_index, load_vocabulary
+from ocr_backend import create_ocr_backend
+from profiling import MetricsWriter, StageTimer, peak_memory_mb, process_peak_memory_mb, reset_peak_memory
+from ocr_cache import DEFAULT_MAX_BYTES, OCRCache, hash_file, make_cache_key
+from streaming import RowWriter, external_sort_rows, iter_image_files
+from text_regions import DETECTION_SETTINGS, detect_text_regions
 
 # Set the Tesseract executable path
 pytesseract.pytesseract.tesseract_cmd = '/opt/homebrew/bin/tesseract'  # Adjust this if necessary
 
-# Initialize the SpellChecker
-spell = SpellChecker()
-
-# Function to preprocess the image using OpenCV for better OCR results
-def preprocess_image(image_path):
-    # Read the image using OpenCV
-    img = cv2.imread(image_path, cv2.IMREAD_COLOR)
-    
-    # Resize the image slightly to make it larger
-    img = cv2.resize(img, (int(img.shape[1] * 1.1), int(img.shape[0] * 1.1)), interpolation=cv2.INTER_LINEAR)
-    
-    # Convert to grayscale
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+# OCR backend: 'tesserocr' keeps one engine loaded per process, 'pytesseract' runs the
+# tesseract executable per image, 'auto' uses tesserocr when it is installed
+OCR_BACKEND = 'auto'
+TESSDATA_PATH = None  # tessdata folder for tesserocr, e.g. '/opt/homebrew/share/tessdata/'
+
+# Settings used for preprocessing and OCR; cached results are keyed by these
+PREPROCESS_SCALE = 1.1
+BLUR_KERNEL = (5, 5)
+
+# Large pages are scaled so their text lands at OCR_TARGET_DPI instead of always being upscaled.
+# The effective DPI is estimated from the height of lowercase letters, assuming body text with an
+# x-height of about BODY_TEXT_X_HEIGHT_INCHES.
+LARGE_IMAGE_PIXELS = 3000000
+OCR_TARGET_DPI = 300
+BODY_TEXT_X_HEIGHT_INCHES = 0.07
+MIN_SCALE = 0.25
+MAX_OCR_PIXELS = 16000000
+# Pages taller than this (after scaling) are OCRed in horizontal strips cut along blank rows
+TILE_HEIGHT = 4000
+OCR_LANG = 'eng+handwriting'
+OCR_CONFIG = '--psm 12'
+
+# Ranked OCR strategies: each pairs a binarization of the page with a Tesseract page segmentation
+# mode. They are tried in order until a pass reaches CONFIDENCE_TARGET (mean word confidence);
+# words from the other passes are merged in when they are at least MERGE_MIN_CONFIDENCE.
+OCR_STRATEGIES = [
+    {'threshold': 'otsu', 'psm': 12},
+    {'threshold': 'adaptive', 'psm': 12},
+    {'threshold': 'otsu', 'psm': 6},
+    {'threshold': 'gray', 'psm': 11},
+]
+CONFIDENCE_TARGET = 80
+MERGE_MIN_CONFIDENCE = 60
+
+# Bump this whenever filter_recognized_words changes, so cached filtered text is rebuilt from the raw OCR
+FILTER_VERSION = 2
+
+# Collection words (place names and the like) that should be kept even though the dictionary does not know them
+CUSTOM_VOCABULARY_FILES = [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vocabulary.txt')]
+
+# Patterns used by filter_recognized_words, compiled once
+TRAILING_LETTER_RE = re.compile(r'(?<=\b[A-Za-z]\.)[A-Za-z]')
+UNWANTED_CHARS_RE = re.compile(r'[^a-zA-Z0-9\s.,;\'"?!-]')
+REPEATED_CHAR_RE = re.compile(r'(.)\1{2,}')
+
+# The word index and OCR engines are loaded lazily so that each worker process builds them once and keeps them.
+# OCR engines are kept per thread, since strategies for one image can run on several threads.
+word_index = None
+ocr_engines = threading.local()
+
+# Number of OCR strategies run at once for one image, and the threads that run them
+strategy_threads = 1
+strategy_executor = None
+
+# Function to get the dictionary word index, memory-mapping it on first use.
+# The index is built from the SpellChecker word list the first time it is needed.
+def get_word_index():
+    global word_index
+    if word_index is None:
+        if not os.path.exists(INDEX_PATH):
+            print("Building dictionary index (first run only)...")
+            build_word_index(INDEX_PATH)
+        word_index = WordIndex(INDEX_PATH, load_vocabulary(CUSTOM_VOCABULARY_FILES))
+    return word_index
+
+# Function to get the version of the word filter, including the word index and custom vocabulary it uses
+def filter_version():
+    index = get_word_index()
+    return f"{FILTER_VERSION}-{index.index_hash[:12]}-{index.vocabulary_hash[:12]}"
+
+# Function to get the OCR backend for the current thread, starting it on first use
+def get_ocr_backend():
+    backend = getattr(ocr_engines, 'backend', None)
+    if backend is None:
+        backend = ocr_engines.backend = create_ocr_backend(OCR_BACKEND, OCR_LANG, OCR_CONFIG, TESSDATA_PATH)
+    return backend
+
+# Function to get the thread pool for running OCR strategies concurrently, or None when there is one thread
+def get_strategy_executor():
+    global strategy_executor
+    if strategy_executor is None and strategy_threads > 1:
+        strategy_executor = ThreadPoolExecutor(max_workers=strategy_threads)
+    return strategy_executor
+
+# Function to read the pixel size and stored DPI of an image from its header, without decoding it.
+# Pillow's decompression-bomb guard would reject the very large scans this is for, and OpenCV does the
+# decoding anyway, so the guard is lifted for this header-only read.
+def read_image_info(image_path):
+    max_pixels = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        with Image.open(image_path) as img:
+            dpi = img.info.get('dpi')
+            return img.size[0], img.size[1], (float(dpi[0]) if dpi and dpi[0] else None)
+    finally:
+        Image.MAX_IMAGE_PIXELS = max_pixels
+
+# Function to estimate the x-height of the text in a grayscale image from the median height of
+# letter-sized connected components; returns None when there are too few to tell
+def estimate_text_height(gray):
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    letters = (heights >= 2) & (heights <= gray.shape[0] // 10) & (widths <= heights * 3) & (areas >= 4)
+    if np.count_nonzero(letters) < 20:
+        return None
+    return float(np.median(heights[letters]))
+
+# Function to estimate the effective DPI of a page from a reduced-size preview of it
+def estimate_effective_dpi(image_path, stored_dpi=None):
+    preview = cv2.imread(image_path, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    text_height = estimate_text_height(preview) if preview is not None else None
+    if text_height:
+        return text_height * 4 / BODY_TEXT_X_HEIGHT_INCHES
+    return stored_dpi
+
+# Function to choose the scale factor for an image.
+# Small images keep the slight upscale; large pages are scaled to OCR_TARGET_DPI.
+def choose_scale(image_path):
+    width, height, stored_dpi = read_image_info(image_path)
+    if width * height <= LARGE_IMAGE_PIXELS:
+        return PREPROCESS_SCALE
+
+    dpi = estimate_effective_dpi(image_path, stored_dpi)
+    scale = OCR_TARGET_DPI / dpi if dpi else 1.0
+    # Never produce a page larger than MAX_OCR_PIXELS
+    scale = min(scale, PREPROCESS_SCALE, (MAX_OCR_PIXELS / (width * height)) ** 0.5)
+    return max(scale, MIN_SCALE)
+
+# Reduced-decode flags that let OpenCV decode straight to grayscale at 1/2, 1/4 or 1/8 size
+REDUCED_GRAYSCALE_FLAGS = {
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+}
+
+# Function to decode an image straight to grayscale at the given scale, using reduced decoding where possible
+def decode_grayscale(image_path, scale):
+    reduction = next((factor for factor in REDUCED_GRAYSCALE_FLAGS if factor * scale <= 1.0), 1)
+    flag = REDUCED_GRAYSCALE_FLAGS.get(reduction, cv2.IMREAD_GRAYSCALE)
+    gray = cv2.imread(image_path, flag)
+    if gray is None:
+        raise ValueError(f"Could not read image {image_path}")
+
+    # Resize the remaining factor that reduced decoding did not cover
+    remaining = scale * reduction
+    if abs(remaining - 1.0) > 0.01:
+        interpolation = cv2.INTER_LINEAR if remaining > 1.0 else cv2.INTER_AREA
+        gray = cv2.resize(gray, (int(gray.shape[1] * remaining), int(gray.shape[0] * remaining)), interpolation=interpolation)
+    return gray
+
+# Function to read an image as grayscale, resized so the text is at a good size for OCR
+def load_grayscale(image_path):
+    return decode_grayscale(image_path, choose_scale(image_path))
+
+# Function to blur and binarize a grayscale page with 'otsu', 'adaptive' or 'gray' (blur only).
+# With in_place the grayscale buffer is reused instead of copied.
+def binarize(gray, method='otsu', in_place=False):
+    img = gray if in_place else gray.copy()
 
     # Apply Gaussian blur to reduce noise
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    cv2.GaussianBlur(img, BLUR_KERNEL, 0, dst=img)
 
     # Apply thresholding for binarization
-    _, thresh_img = cv2.threshold(blurred, 128, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if method == 'otsu':
+        cv2.threshold(img, 128, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=img)
+    elif method == 'adaptive':
+        img = cv2.adaptiveThreshold(img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 15)
+    elif method != 'gray':
+        raise ValueError(f"Unknown threshold method: {method}")
+    return img
 
-    return thresh_img
+# Function to preprocess the image using OpenCV for better OCR results
+def preprocess_image(image_path):
+    return binarize(load_grayscale(image_path), 'otsu', in_place=True)
+
+# Function to split a tall page into horizontal strips (views, not copies), cutting along the emptiest rows
+def split_into_tiles(img, tile_height=TILE_HEIGHT):
+    height = img.shape[0]
+    if height <= tile_height:
+        return [img]
+
+    # Count the ink (dark pixels) in each row of the page
+    ink_per_row = np.count_nonzero(img < 128, axis=1)
+    window = tile_height // 10
+    tiles = []
+    top = 0
+    while height - top > tile_height:
+        # Cut at the row with the least ink near the nominal tile boundary
+        lo = top + tile_height - window
+        cut = lo + int(np.argmin(ink_per_row[lo:top + tile_height]))
+        tiles.append(img[top:cut])
+        top = cut
+    tiles.append(img[top:])
+    return tiles
 
 # Function to save the first preprocessed image as example_image.png
 def save_example_image(image_path, output_folder):
@@ -38,34 +225,182 @@ def save_example_image(image_path, output_folder):
     cv2.imwrite(example_image_path, preprocessed_img)
     print(f"Example image saved as {example_image_path}")
 
-# Function to merge new recognized words into existing text
-def merge_text(existing_text, new_text):
-    if not existing_text:
-        return new_text.strip()
-    
-    # Split existing text and new text into word lists
-    existing_words = set(existing_text.split())
-    new_words = set(new_text.split())
-
-    # Combine both sets of words
-    combined_words = existing_words.union(new_words)
-
-    # Reconstruct text from combined words
-    combined_text = ' '.join(combined_words)
-    return combined_text.strip()
+# Function to tell whether two word boxes cover mostly the same spot on the page
+def words_overlap(a, b, min_overlap=0.5):
+    width = min(a['left'] + a['width'], b['left'] + b['width']) - max(a['left'], b['left'])
+    height = min(a['top'] + a['height'], b['top'] + b['height']) - max(a['top'], b['top'])
+    if width <= 0 or height <= 0:
+        return False
+    smaller = min(a['width'] * a['height'], b['width'] * b['height'])
+    return width * height >= min_overlap * max(smaller, 1)
+
+# Function to merge new recognized words into existing words.
+# A new word replaces an overlapping existing word when it is more confident, and is added when
+# nothing was read at its position; the result is put back into reading order.
+def merge_text(existing_words, new_words):
+    merged = list(existing_words)
+    for word in new_words:
+        overlapping = [i for i, existing in enumerate(merged) if words_overlap(existing, word)]
+        if not overlapping:
+            merged.append(word)
+        elif all(word['conf'] > merged[i]['conf'] for i in overlapping):
+            for i in reversed(overlapping):
+                del merged[i]
+            merged.append(word)
+    return sort_reading_order(merged)
+
+# Function to sort words into reading order: region by region, then line by line from the top, left to right
+def sort_reading_order(words):
+    ordered = []
+    for region in sorted({word['region'] for word in words}):
+        region_words = sorted((w for w in words if w['region'] == region), key=lambda w: w['top'] + w['height'] / 2)
+        line_gap = float(np.median([w['height'] for w in region_words])) / 2
+        lines = []
+        for word in region_words:
+            center = word['top'] + word['height'] / 2
+            if lines and center - lines[-1][0] <= line_gap:
+                lines[-1][1].append(word)
+            else:
+                lines.append([center, [word]])
+        for _, line in lines:
+            ordered.extend(sorted(line, key=lambda w: w['left']))
+    return ordered
+
+# Function to turn words in reading order back into text, one line per row of words
+def words_to_text(words):
+    lines = []
+    last = None
+    for word in words:
+        same_line = (
+            last is not None
+            and word['region'] == last['region']
+            and abs((word['top'] + word['height'] / 2) - (last['top'] + last['height'] / 2)) <= last['height'] / 2
+        )
+        if same_line:
+            lines[-1].append(word['text'])
+        else:
+            lines.append([word['text']])
+        last = word
+    return '\n'.join(' '.join(line) for line in lines)
+
+# Function to score an OCR pass by its mean word confidence, weighting longer words more
+def score_words(words):
+    total = sum(len(word['text']) for word in words)
+    if not total:
+        return 0.0
+    return sum(word['conf'] * len(word['text']) for word in words) / total
+
+# Function to read the words of an image with Tesseract OCR; very tall pages are read strip by strip
+def ocr_words(img, psm=None):
+    backend = get_ocr_backend()
+    words = []
+    top = 0
+    for tile in split_into_tiles(img):
+        for word in backend.image_to_data(tile, psm):
+            word['top'] += top
+            words.append(word)
+        top += tile.shape[0]
+    return words
+
+# Function to choose the crops to OCR for the detected text regions
+def region_crops(regions):
+    if len(regions) > 1 and not get_ocr_backend().persistent:
+        # Starting tesseract per region costs more than it saves; read one crop around all of them
+        x0 = min(x for x, _, _, _ in regions)
+        y0 = min(y for _, y, _, _ in regions)
+        x1 = max(x + w for x, _, w, _ in regions)
+        y1 = max(y + h for _, y, _, h in regions)
+        return [[x0, y0, x1 - x0, y1 - y0]]
+    return regions
+
+# Function to run one OCR strategy over the text regions of a page, returning words in page coordinates
+def run_strategy(gray, binarized, regions, strategy):
+    img = binarized if strategy['threshold'] == 'otsu' else binarize(gray, strategy['threshold'])
+    words = []
+    for region, (x, y, w, h) in enumerate(region_crops(regions)):
+        for word in ocr_words(img[y:y + h, x:x + w], strategy['psm']):
+            word['left'] += x
+            word['top'] += y
+            word['region'] = region
+            words.append(word)
+    return words
+
+# Function to try the OCR strategies in rank order until one reaches the confidence target, then merge
+# the passes that ran. When there are free cores the strategies run concurrently, best rank first;
+# the result is the same either way.
+def recognize_page(gray, binarized, regions, strategies=OCR_STRATEGIES):
+    if not regions:
+        return ""
 
-# Function to extract text using Tesseract OCR
-def extract_text(image_path, attempt=1, max_attempts=3):
+    passes = []
+    executor = get_strategy_executor()
+    if executor is None:
+        for strategy in strategies:
+            words = run_strategy(gray, binarized, regions, strategy)
+            passes.append((score_words(words), words))
+            if passes[-1][0] >= CONFIDENCE_TARGET:
+                break
+    else:
+        # Later strategies start ahead of time on the free threads, but results are taken in rank order,
+        # so the early exit and the merged text are the same as when the strategies run one by one
+        futures = []
+        try:
+            for rank in range(len(strategies)):
+                while len(futures) < min(rank + strategy_threads, len(strategies)):
+                    futures.append(executor.submit(run_strategy, gray, binarized, regions, strategies[len(futures)]))
+                words = futures[rank].result()
+                passes.append((score_words(words), words))
+                if passes[-1][0] >= CONFIDENCE_TARGET:
+                    break
+        finally:
+            # Drop the strategies past the early exit, and let the ones already running finish so
+            # their threads and OCR engines are free before the next image
+            for future in futures:
+                future.cancel()
+            wait(futures)
+
+    # Start from the most confident pass and merge in confident words the others found
+    passes.sort(key=lambda item: item[0], reverse=True)
+    merged = sort_reading_order(passes[0][1]) if passes[0][1] else []
+    for _, words in passes[1:]:
+        merged = merge_text(merged, [word for word in words if word['conf'] >= MERGE_MIN_CONFIDENCE])
+    return words_to_text(merged)
+
+# Function to describe every setting that changes the text-region boxes, for the cache key
+def region_settings():
+    return {
+        'preprocess': {
+            'scale': PREPROCESS_SCALE,
+            'blur_kernel': list(BLUR_KERNEL),
+            'threshold': 'otsu',
+            'large_image_pixels': LARGE_IMAGE_PIXELS,
+            'target_dpi': OCR_TARGET_DPI,
+            'x_height_inches': BODY_TEXT_X_HEIGHT_INCHES,
+            'min_scale': MIN_SCALE,
+            'max_pixels': MAX_OCR_PIXELS,
+            'tile_height': TILE_HEIGHT,
+        },
+        'detection': DETECTION_SETTINGS,
+    }
+
+# Function to describe every setting that changes the raw OCR output, for the cache key
+def ocr_settings():
+    return dict(
+        region_settings(),
+        lang=OCR_LANG,
+        config=OCR_CONFIG,
+        strategies=OCR_STRATEGIES,
+        confidence_target=CONFIDENCE_TARGET,
+        merge_min_confidence=MERGE_MIN_CONFIDENCE,
+    )
+
+# Function to extract text using Tesseract OCR, trying strategies `attempt` to `max_attempts` (counting from 1)
+def extract_text(image_path, attempt=1, max_attempts=len(OCR_STRATEGIES)):
     try:
-        img = preprocess_image(image_path)
-        # Convert the image array back to PIL Image for compatibility with Tesseract
-        # Use psm 12 for table/column recognition
-        text = pytesseract.image_to_string(img, lang='eng+handwriting', config='--psm 12').strip()
-
-        if not text:
-            return text
-        
-        return text
+        gray = load_grayscale(image_path)
+        binarized = binarize(gray, 'otsu')
+        regions = detect_text_regions(binarized)
+        return recognize_page(gray, binarized, regions, OCR_STRATEGIES[attempt - 1:max_attempts])
 
     except Exception as e:
         print(f"Error processing {image_path}: {e}")
@@ -74,84 +409,316 @@ def extract_text(image_path, attempt=1, max_attempts=3):
 # Function to filter out unrecognized words from extracted text
 def filter_recognized_words(text):
     # Allow single characters followed by a period (like U.S.D.A)
-    text = re.sub(r'(?<=\b[A-Za-z]\.)[A-Za-z]', '', text)  # Remove trailing letters after a period
+    text = TRAILING_LETTER_RE.sub('', text)  # Remove trailing letters after a period
 
     # Remove unwanted characters while retaining common punctuation
-    text = re.sub(r'[^a-zA-Z0-9\s.,;\'"?!-]', '', text)  # Keep letters, numbers, spaces, and some punctuation
-
-    # Split the text into words
-    words = text.split()
+    text = UNWANTED_CHARS_RE.sub('', text)  # Keep letters, numbers, spaces, and some punctuation
 
-    # Length filtering: Discard words shorter than 3 characters or longer than 15 characters
-    words = [word for word in words if 3 <= len(word) <= 15]
+    # In one pass over the words, discard words shorter than 3 characters or longer than 15 characters,
+    # numeric-only words, and gibberish with repeated characters
+    words = [
+        word for word in text.split()
+        if 3 <= len(word) <= 15 and not word.isdigit() and not REPEATED_CHAR_RE.search(word)
+    ]
 
-    # Pattern filtering: Discard repeated characters, numeric-only words, and gibberish
-    words = [word for word in words if not re.search(r'(.)\1{2,}', word) and not re.match(r'^\d+$', word)]
-    
-    # Filter words using the spell checker
-    recognized_words = [word for word in words if word in spell]
+    # Keep the words the dictionary (or the collection vocabulary) knows, looked up as one batch
+    known = get_word_index().contains_many(words)
+    recognized_words = [word for word, is_known in zip(words, known) if is_known]
 
     # Join the recognized words back into a string
     return ' '.join(recognized_words)
 
-# Function to process images in folder A and export transcriptions to a CSV file in folder B
-def process_images(input_folder, output_folder, output_csv):
+# Function to load the word index and OCR engine once when a worker process starts
+def init_worker(threads=1):
+    global strategy_threads
+    strategy_threads = threads
+    get_word_index()
+    get_ocr_backend()
+
+# Function to run detection, OCR and filtering on one image.
+# Returns (raw_text, filtered_text, error, regions, metrics), where metrics holds the time spent in each
+# stage, the peak memory while processing this image (None where it cannot be measured per image) and
+# the peak memory of the process. Region boxes from an earlier run can be passed in to skip the detection pass.
+def process_image_file(input_image_path, regions=None):
+    timer = StageTimer()
+    peak_reset = reset_peak_memory()
+    try:
+        with timer.stage('decode'):
+            gray = load_grayscale(input_image_path)
+        with timer.stage('preprocess'):
+            binarized = binarize(gray, 'otsu')
+
+        # Find the text regions; a page with none is not sent to OCR at all
+        with timer.stage('detect'):
+            if regions is None:
+                regions = detect_text_regions(binarized)
+        with timer.stage('ocr'):
+            text = recognize_page(gray, binarized, regions)
+
+        # Filter out unrecognized words
+        with timer.stage('filter'):
+            filtered_text = filter_recognized_words(text)
+        error = None
+    except Exception as e:
+        print(f"Error processing {input_image_path}: {e}")
+        text, filtered_text, error, regions = None, None, str(e), None
+    image_metrics = {
+        'stages': timer.timings,
+        'peak_rss_mb': peak_memory_mb() if peak_reset else None,
+        'process_peak_rss_mb': process_peak_memory_mb(),
+    }
+    return text, filtered_text, error, regions, image_metrics
+
+# Function to format the CSV row for one image
+def format_row(filename, filtered_text, error=None):
+    if error is not None:
+        # Record the failure in the row for that image
+        return [filename, f"Error: {error}"]
+
+    if filtered_text:  # If any recognized text is detected
+        # Format the text for CSV output
+        return [filename, f'includes the text: "{filtered_text}"']
+
+    # If no text is detected, leave the column empty
+    return [filename, "No text detected"]
+
+# Function to look up an image in the cache, returning (cache_key, region_key, regions, row).
+# On a miss row is None, and regions holds the boxes stored by an earlier run, if any.
+def lookup_cached_row(cache, input_image_path, filename):
+    try:
+        content_hash = hash_file(input_image_path)
+    except OSError as e:
+        return None, None, None, format_row(filename, None, e)
+    key = make_cache_key(content_hash, ocr_settings())
+    region_key = make_cache_key(content_hash, region_settings())
+
+    raw_text = cache.get_raw(key)
+    if raw_text is None:
+        return key, region_key, cache.get_regions(region_key), None
+
+    # Raw OCR is cached; only re-run the filter if it changed since the text was stored
+    filtered_text = cache.get_filtered(key, filter_version())
+    if filtered_text is None:
+        filtered_text = filter_recognized_words(raw_text)
+        cache.put_filtered(key, filter_version(), filtered_text)
+    return key, region_key, None, format_row(filename, filtered_text)
+
+# Function to process image files on a pool of worker processes, yielding rows in input order.
+# At most `max_pending` images are in flight, so memory stays bounded however many paths there are.
+# With a cache, images seen before are not OCRed again, and rows finished for `run` are
+# checkpointed so an interrupted run resumes where it stopped; with checkpoint_only the cache is
+# only used for the checkpoint. The checkpoint is loaded up front unless preload_checkpoint is
+# False, in which case it is looked up per image, as a long-running service must do to keep its
+# memory flat. With `metrics`, per-image stage timings and peak memory are recorded. A None in
+# `image_paths` is a tick from a long-running source: rows that are already finished are yielded
+# without waiting for more paths.
+def process_image_files(image_paths, workers=None, cache=None, run=None, root=None, max_pending=None, metrics=None,
+                        checkpoint_only=False, preload_checkpoint=True):
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    done = cache.load_checkpoint(run) if cache is not None and run and preload_checkpoint else {}
+    if done:
+        print(f"Resuming: {len(done)} images already processed")
+
+    # Cores left over by the worker processes are used to run OCR strategies concurrently
+    threads = max((os.cpu_count() or 1) // workers, 1)
+    executor = None
+    if workers > 1:
+        # Make sure the word index exists before the workers memory-map it
+        get_word_index()
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(threads,))
+        max_pending = max_pending or workers * 4
+    else:
+        init_worker(threads)
+        max_pending = 1
+
+    # Replace the pool after a worker died (out of memory, a crash inside OpenCV or tesserocr);
+    # a broken pool refuses all further work. Does nothing if `broken` was already replaced.
+    def restart_pool(broken):
+        nonlocal executor
+        if executor is broken:
+            print("A worker process died; restarting the worker pool")
+            broken.shutdown(wait=False, cancel_futures=True)
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(threads,))
+
+    # Send an image to the worker pool, restarting the pool first if it is broken
+    def submit(job):
+        try:
+            job['future'] = executor.submit(process_image_file, job['path'], job['regions'])
+        except BrokenProcessPool:
+            restart_pool(executor)
+            job['future'] = executor.submit(process_image_file, job['path'], job['regions'])
+        job['executor'] = executor
+        job['attempts'] += 1
+
+    # Resolve a checkpointed or cached image, or start OCR for it
+    def start(input_image_path):
+        filename = os.path.basename(input_image_path)
+        if root and os.path.abspath(input_image_path).startswith(os.path.join(os.path.abspath(root), '')):
+            filename = os.path.relpath(input_image_path, root)
+        job = {
+            'path': input_image_path, 'filename': filename, 'key': None, 'region_key': None, 'regions': None,
+            'row': done.get(input_image_path), 'future': None, 'executor': None, 'attempts': 0,
+            'timer': StageTimer(), 'source': 'checkpoint',
+        }
+        if job['row'] is None and cache is not None and run and not preload_checkpoint:
+            job['row'] = cache.get_checkpoint(run, input_image_path)
+        if job['row'] is None and cache is not None and not checkpoint_only:
+            with job['timer'].stage('lookup'):
+                job['key'], job['region_key'], job['regions'], job['row'] = lookup_cached_row(cache, input_image_path, filename)
+            job['source'] = 'cache'
+        if job['row'] is None and executor is not None:
+            submit(job)
+        return job
+
+    # Wait for the worker result of an image. When a worker dies, every image in flight on that pool fails
+    # with it, so the pool is restarted and the image retried once; only an image that fails again gets an error.
+    def wait_for_result(job):
+        while True:
+            try:
+                return job['future'].result()
+            except BrokenProcessPool as e:
+                restart_pool(job['executor'])
+                if job['attempts'] >= 2:
+                    print(f"Error processing {job['path']}: {e}")
+                    return None, None, str(e), None, None
+                submit(job)
+            except Exception as e:
+                print(f"Error processing {job['path']}: {e}")
+                return None, None, str(e), None, None
+
+    # Wait for an image to finish and build its row
+    def finish(job):
+        filename, timer, row = job['filename'], job['timer'], job['row']
+        if row is not None:
+            if metrics is not None:
+                metrics.record(filename, job['source'], timer.timings)
+            if run and job['source'] == 'cache' and job['key'] is not None:
+                # Checkpoint cache hits too, so a resumed run (or the service) does not hash the file again
+                cache.save_checkpoint(run, job['path'], row)
+            return row
+
+        if job['future'] is None:
+            print(f"Processing {filename}...")
+            raw_text, filtered_text, error, regions, image_metrics = process_image_file(job['path'], job['regions'])
+        else:
+            raw_text, filtered_text, error, regions, image_metrics = wait_for_result(job)
+            print(f"Processed {filename}")
+
+        if metrics is not None and image_metrics is not None:
+            metrics.record(filename, 'ocr', dict(timer.timings, **image_metrics['stages']),
+                           image_metrics['peak_rss_mb'], image_metrics['process_peak_rss_mb'])
+
+        row = format_row(filename, filtered_text, error)
+        if error is None and cache is not None:
+            if job['region_key'] is not None:
+                cache.put_regions(job['region_key'], regions)
+            if job['key'] is not None:
+                cache.put(job['key'], raw_text, filter_version(), filtered_text)
+            if run:
+                cache.save_checkpoint(run, job['path'], row)
+        return row
+
+    try:
+        pending = deque()
+        for input_image_path in image_paths:
+            if input_image_path is None:
+                # Yield the finished rows at the front; a job without a future is resolved or runs inline
+                while pending and (pending[0]['future'] is None or pending[0]['future'].done()):
+                    yield finish(pending.popleft())
+                continue
+            pending.append(start(input_image_path))
+            while len(pending) >= max_pending:
+                yield finish(pending.popleft())
+        while pending:
+            yield finish(pending.popleft())
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+# Function to sort rows alphabetically by filename (first column), case-insensitively
+def row_sort_key(row):
+    return row[0].lower()
+
+# Function to process images in folder A (and its subfolders) and export transcriptions to a CSV file in folder B.
+# Rows are written to disk as they finish, so memory does not grow with the collection and a crash keeps
+# the finished rows; the sorted CSV is then built with an external merge sort. With metrics_file, stage
+# timings and peak memory for every image are written to that file in the output folder.
+def process_images(input_folder, output_folder, output_csv, workers=None, use_cache=True, cache_dir=None, cache_max_bytes=None, output_jsonl=None, metrics_file=None):
     # Create the output folder if it doesn't exist
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
-    csv_rows = []
-    first_image_path = None
-
-    # Iterate through each file in the input folder
-    for filename in sorted(os.listdir(input_folder)):
-        if filename.lower().endswith((".png", ".tiff", ".jpg", ".jpeg")):
-            input_image_path = os.path.join(input_folder, filename)
-            print(f"Processing {filename}...")
-
-            # Set the first image for saving an example
-            if first_image_path is None:
-                first_image_path = input_image_path
-
-            # Extract text using Tesseract OCR
-            text = extract_text(input_image_path)
-
-            # Filter out unrecognized words
-            filtered_text = filter_recognized_words(text)
-
-            if filtered_text:  # If any recognized text is detected
-                # Format the text for CSV output
-                formatted_text = f'includes the text: "{filtered_text}"'
-                csv_rows.append([filename, formatted_text])
-            else:
-                # If no text is detected, leave the column empty
-                csv_rows.append([filename, "No text detected"])
-
-    # Save an example image for visual inspection
-    if first_image_path:
-        save_example_image(first_image_path, output_folder)
-
-    # Sort the rows alphabetically by filename (first column)
-    csv_rows.sort(key=lambda x: x[0].lower())  # Sort case-insensitively
-
-    # Write the transcriptions to a CSV file with UTF-8 encoding
+    # Open the OCR result cache, kept next to the output by default
+    cache = None
+    if use_cache:
+        cache_dir = cache_dir or os.path.join(output_folder, '.ocr_cache')
+        cache = OCRCache(cache_dir, cache_max_bytes or DEFAULT_MAX_BYTES)
     csv_output_path = os.path.join(output_folder, output_csv)
-    with open(csv_output_path, mode='w', newline='', encoding='utf-8-sig') as csv_file:
-        writer = csv.writer(csv_file)
-        # Write the header
-        writer.writerow(['Filename', 'Transcribed Text'])
+    spool_path = csv_output_path + '.partial'
+    jsonl_output_path = os.path.join(output_folder, output_jsonl) if output_jsonl else None
+    run = os.path.abspath(csv_output_path)
+    metrics = MetricsWriter(os.path.join(output_folder, metrics_file)) if metrics_file else None
 
-        # Write the rows
-        for row in csv_rows:
-            # Only write the transcribed text without additional quotes
-            writer.writerow([row[0], row[1].replace('"', '')])  # Remove extra quotes
+    try:
+        first_image_path = None
+
+        # Stream the image files, remembering the first one for the example image
+        def image_paths():
+            nonlocal first_image_path
+            for input_image_path in iter_image_files(input_folder):
+                if first_image_path is None:
+                    first_image_path = input_image_path
+                yield input_image_path
+
+        # Extract and filter text for every image on `workers` processes, flushing each row as it finishes
+        with RowWriter(spool_path, jsonl_output_path) as row_writer:
+            for row in process_image_files(image_paths(), workers, cache, run, root=input_folder, metrics=metrics):
+                with metrics.stage('write') if metrics is not None else nullcontext():
+                    row_writer.write(row)
+
+        # Save an example image for visual inspection
+        if first_image_path:
+            save_example_image(first_image_path, output_folder)
+
+        # Write the transcriptions to a CSV file with UTF-8 encoding, sorted by filename
+        with open(csv_output_path, mode='w', newline='', encoding='utf-8-sig') as csv_file:
+            writer = csv.writer(csv_file)
+            # Write the header
+            writer.writerow(['Filename', 'Transcribed Text'])
+
+            # Write the rows
+            with metrics.stage('sort') if metrics is not None else nullcontext():
+                for row in external_sort_rows(spool_path, row_sort_key, tmp_dir=output_folder):
+                    # Only write the transcribed text without additional quotes
+                    writer.writerow([row[0], row[1].replace('"', '')])  # Remove extra quotes
+        os.remove(spool_path)
+
+        # The run finished, so its checkpoint is no longer needed
+        if cache is not None:
+            cache.clear_checkpoint(run)
+    finally:
+        if cache is not None:
+            cache.close()
+        if metrics is not None:
+            metrics.close()
 
     print(f"Saved transcriptions to {csv_output_path}")
 
 if __name__ == "__main__":
-    # Set the correct paths for Folder A (input images) and Folder B (output CSV)
-    input_folder = "A"  # Relative path to Folder A
-    output_folder = "B"  # Relative path to Folder B
-    output_csv = "transcriptions.csv"
-
-    process_images(input_folder, output_folder, output_csv)
+    import argparse
+
+    # Folder A (input images) and Folder B (output CSV) are the defaults
+    parser = argparse.ArgumentParser(description="Extract text from images and export transcriptions to a CSV file.")
+    parser.add_argument('input_folder', nargs='?', default="A", help="folder with the images (default A)")
+    parser.add_argument('output_folder', nargs='?', default="B", help="folder for the CSV file (default B)")
+    parser.add_argument('--csv', default="transcriptions.csv", help="CSV file name (default transcriptions.csv)")
+    parser.add_argument('--jsonl', help="also write the rows to this JSONL file")
+    parser.add_argument('--metrics', help="write per-image stage timings to this file")
+    parser.add_argument('--workers', type=int, help="worker processes (default: number of CPUs)")
+    parser.add_argument('--no-cache', action='store_true', help="do not use the OCR result cache")
+    args = parser.parse_args()
+
+    process_images(args.input_folder, args.output_folder, args.csv, workers=args.workers, use_cache=not args.no_cache,
+                   output_jsonl=args.jsonl, metrics_file=args.metrics)
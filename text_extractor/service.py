@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import script
+from ocr_cache import DEFAULT_MAX_BYTES, OCRCache
+from profiling import MetricsWriter
+from streaming import IMAGE_EXTENSIONS, RowWriter, iter_image_files
+
+# Jobs waiting for a worker; when the queue is full, new jobs are refused until it drains
+DEFAULT_QUEUE_SIZE = 256
+# Seconds between inbox scans
+DEFAULT_POLL_INTERVAL = 2.0
+# Seconds the dispatcher waits for a new job before handing back finished rows
+TICK_INTERVAL = 0.5
+
+
+# Long-running OCR service: images arrive through a watched inbox folder and/or a local HTTP
+# endpoint, go through one long-lived process_image_files pipeline (so the worker pool, OCR
+# engines and word index stay warm), and each finished row is appended to the transcription CSV.
+class OCRService:
+    def __init__(self, output_folder, output_csv, inbox=None, http_port=None, http_host='127.0.0.1',
+                 workers=None, queue_size=DEFAULT_QUEUE_SIZE, poll_interval=DEFAULT_POLL_INTERVAL,
+                 use_cache=True, cache_dir=None, cache_max_bytes=None, output_jsonl=None, metrics_file=None):
+        os.makedirs(output_folder, exist_ok=True)
+        self.output_folder = output_folder
+        self.csv_output_path = os.path.join(output_folder, output_csv)
+        self.jsonl_output_path = os.path.join(output_folder, output_jsonl) if output_jsonl else None
+        self.metrics_path = os.path.join(output_folder, metrics_file) if metrics_file else None
+        self.inbox = inbox
+        self.http_port = http_port
+        self.http_host = http_host
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.use_cache = use_cache
+        self.cache_dir = cache_dir or os.path.join(output_folder, '.ocr_cache')
+        self.cache_max_bytes = cache_max_bytes or DEFAULT_MAX_BYTES
+
+        # Rows for the service are checkpointed under the CSV path, so a restart skips inbox files already done
+        self.run = os.path.abspath(self.csv_output_path)
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        # Inbox files queued or being processed; finished files are found through the checkpoint instead
+        # of being remembered here
+        self.active = set()
+        self.active_lock = threading.Lock()
+        # Paths handed to the pipeline, in order, until their rows come out
+        self.in_progress = deque()
+        self.processed = 0
+        self.started = time.time()
+        self.http_server = None
+
+    # Queue one image; returns False when the queue is full (backpressure)
+    def submit(self, path):
+        try:
+            self.jobs.put_nowait(path)
+        except queue.Full:
+            return False
+        return True
+
+    def status(self):
+        return {
+            'queued': self.jobs.qsize(),
+            'queue_size': self.jobs.maxsize,
+            'processed': self.processed,
+            'uptime': round(time.time() - self.started, 1),
+        }
+
+    # Scan the inbox until stopped, queueing files that are new or changed.
+    # A file is only queued once its size and modification time are the same on two scans in a row,
+    # so images still being copied in are left alone. Files that do not fit in the queue wait for the next scan.
+    # Files already finished (by this or an earlier run of the service) are looked up in the checkpoint one by one.
+    def watch_inbox(self):
+        # SQLite connections are per thread, so the watcher opens its own
+        with OCRCache(self.cache_dir, self.cache_max_bytes) as cache:
+            # Signature of every file in the inbox on the last scan: memory follows the size of the
+            # inbox, so move finished files out of it if it keeps growing
+            candidates = {}
+            while not self.stop_event.is_set():
+                current = {}
+                for path in iter_image_files(self.inbox):
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    with self.active_lock:
+                        if path in self.active:
+                            continue
+                    signature = (stat.st_size, stat.st_mtime_ns)
+                    current[path] = signature
+                    if candidates.get(path) != signature:
+                        continue
+                    if self.jobs.full() or cache.get_checkpoint(self.run, path) is not None:
+                        continue
+                    with self.active_lock:
+                        self.active.add(path)
+                    if not self.submit(path):
+                        with self.active_lock:
+                            self.active.discard(path)
+                candidates = current
+                self.stop_event.wait(self.poll_interval)
+
+    # Start the local HTTP endpoint:
+    #   POST /jobs  with {"paths": [...]} (or {"path": "..."}) queues images; 503 when the queue is full
+    #   GET /status returns the queue depth and the number of images processed
+    def start_http(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def send_json(self, status, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                if status == 503:
+                    self.send_header('Retry-After', str(int(service.poll_interval) or 1))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == '/status':
+                    self.send_json(200, service.status())
+                else:
+                    self.send_json(404, {'error': 'not found'})
+
+            def do_POST(self):
+                if self.path != '/jobs':
+                    self.send_json(404, {'error': 'not found'})
+                    return
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                    paths = body.get('paths') or ([body['path']] if 'path' in body else [])
+                except (ValueError, AttributeError, KeyError):
+                    self.send_json(400, {'error': 'expected JSON with "paths" or "path"'})
+                    return
+
+                invalid = [p for p in paths if not (os.path.isfile(p) and p.lower().endswith(IMAGE_EXTENSIONS))]
+                if not paths or invalid:
+                    self.send_json(400, {'error': 'not an image file', 'paths': invalid})
+                    return
+
+                queued = 0
+                for path in paths:
+                    if not service.submit(path):
+                        self.send_json(503, {'error': 'queue full', 'queued': queued, 'rejected': paths[queued:]})
+                        return
+                    queued += 1
+                self.send_json(202, {'queued': queued})
+
+            def log_message(self, format, *args):
+                pass
+
+        self.http_server = ThreadingHTTPServer((self.http_host, self.http_port), Handler)
+        threading.Thread(target=self.http_server.serve_forever, daemon=True).start()
+        print(f"Accepting jobs at http://{self.http_host}:{self.http_server.server_port}/jobs")
+
+    # Yield queued image paths until stopped; None is yielded while idle so finished rows still come out
+    def job_paths(self):
+        while not self.stop_event.is_set():
+            try:
+                path = self.jobs.get(timeout=TICK_INTERVAL)
+            except queue.Empty:
+                yield None
+                continue
+            self.in_progress.append(path)
+            yield path
+
+    # Run until stopped (or interrupted with Ctrl+C), appending each finished row to the CSV
+    def serve(self):
+        # The cache database also holds the checkpoint, so it is opened even without the OCR cache.
+        # It is created before the watcher opens its own connection, as two connections setting up
+        # a new database at once can fail with "database is locked".
+        cache = OCRCache(self.cache_dir, self.cache_max_bytes)
+        if self.inbox:
+            threading.Thread(target=self.watch_inbox, daemon=True).start()
+            print(f"Watching {self.inbox} for new images")
+        if self.http_port is not None:
+            self.start_http()
+
+        metrics = MetricsWriter(self.metrics_path) if self.metrics_path else None
+        header = ['Filename', 'Transcribed Text']
+        try:
+            with RowWriter(self.csv_output_path, self.jsonl_output_path, append=True,
+                           encoding='utf-8-sig', header=header) as row_writer:
+                rows = script.process_image_files(self.job_paths(), self.workers, cache, self.run,
+                                                  root=self.inbox, metrics=metrics,
+                                                  checkpoint_only=not self.use_cache, preload_checkpoint=False)
+                for row in rows:
+                    # Only write the transcribed text without additional quotes
+                    row_writer.write([row[0], row[1].replace('"', '')])
+                    self.processed += 1
+                    # Rows come out in the order the paths went in
+                    path = self.in_progress.popleft()
+                    if row[1].startswith('Error:') and os.path.exists(path):
+                        # Checkpoint failures too, so the watcher does not retry a broken file until it changes
+                        cache.save_checkpoint(self.run, path, row)
+                    with self.active_lock:
+                        self.active.discard(path)
+        except KeyboardInterrupt:
+            print("Stopping...")
+        finally:
+            self.stop()
+            cache.close()
+            if metrics is not None:
+                metrics.close()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.http_server is not None:
+            self.http_server.shutdown()
+            self.http_server = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the text extractor as a long-running OCR service.")
+    parser.add_argument('output_folder', nargs='?', default="B", help="folder for the CSV file (default B)")
+    parser.add_argument('--inbox', help="folder to watch for new images")
+    parser.add_argument('--port', type=int, help="port for the local HTTP endpoint")
+    parser.add_argument('--host', default='127.0.0.1', help="address for the HTTP endpoint (default 127.0.0.1)")
+    parser.add_argument('--csv', default="transcriptions.csv", help="CSV file to append to (default transcriptions.csv)")
+    parser.add_argument('--jsonl', help="also append the rows to this JSONL file")
+    parser.add_argument('--metrics', help="write per-image stage timings to this file")
+    parser.add_argument('--workers', type=int, help="worker processes (default: number of CPUs)")
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE, help=f"jobs waiting before new ones are refused (default {DEFAULT_QUEUE_SIZE})")
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL, help=f"seconds between inbox scans (default {DEFAULT_POLL_INTERVAL})")
+    parser.add_argument('--no-cache', action='store_true', help="do not use the OCR result cache")
+    args = parser.parse_args()
+
+    if not args.inbox and args.port is None:
+        parser.error("give --inbox, --port or both")
+
+    OCRService(args.output_folder, args.csv, inbox=args.inbox, http_port=args.port, http_host=args.host,
+               workers=args.workers, queue_size=args.queue_size, poll_interval=args.poll_interval,
+               use_cache=not args.no_cache, output_jsonl=args.jsonl, metrics_file=args.metrics).serve()
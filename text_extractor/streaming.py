@@ -0,0 +1,89 @@
+import csv
+import heapq
+import json
+import os
+import tempfile
+
+IMAGE_EXTENSIONS = (".png", ".tiff", ".jpg", ".jpeg")
+
+# Number of rows sorted in memory at a time when merging the final CSV
+DEFAULT_SORT_CHUNK_ROWS = 100000
+
+# Function to walk a collection folder and its subfolders, yielding image paths one at a time.
+# Entries are sorted within each folder so runs are deterministic; only one folder listing is held in memory.
+def iter_image_files(root, extensions=IMAGE_EXTENSIONS):
+    with os.scandir(root) as it:
+        entries = sorted(it, key=lambda entry: entry.name.lower())
+    for entry in entries:
+        if entry.name.startswith('.'):
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            yield from iter_image_files(entry.path, extensions)
+        elif entry.is_file() and entry.name.lower().endswith(extensions):
+            yield entry.path
+
+
+# Writer that appends rows to disk as soon as they finish.
+# Rows go to an unsorted spool CSV (used later to build the sorted CSV) and, optionally, a JSONL file.
+# With append, existing files are extended instead of replaced, and `header` is only written to a new CSV.
+class RowWriter:
+    def __init__(self, spool_path, jsonl_path=None, append=False, encoding='utf-8', header=None):
+        mode = 'a' if append else 'w'
+        is_new = not append or not os.path.exists(spool_path) or os.path.getsize(spool_path) == 0
+        self.spool_file = open(spool_path, mode=mode, newline='', encoding=encoding)
+        self.spool = csv.writer(self.spool_file)
+        if header and is_new:
+            self.spool.writerow(header)
+        self.jsonl_file = open(jsonl_path, mode=mode, encoding='utf-8') if jsonl_path else None
+
+    def write(self, row):
+        self.spool.writerow(row)
+        self.spool_file.flush()
+        if self.jsonl_file is not None:
+            record = {'filename': row[0], 'transcribed_text': row[1].replace('"', '')}
+            self.jsonl_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self.jsonl_file.flush()
+
+    def close(self):
+        self.spool_file.close()
+        if self.jsonl_file is not None:
+            self.jsonl_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Function to sort a chunk of rows and write it to a temporary run file
+def _write_sorted_run(rows, key, tmp_dir):
+    rows.sort(key=key)
+    fd, run_path = tempfile.mkstemp(suffix='.csv', dir=tmp_dir)
+    with os.fdopen(fd, mode='w', newline='', encoding='utf-8') as run_file:
+        csv.writer(run_file).writerows(rows)
+    return run_path
+
+# Function to read rows back from a CSV run file
+def _read_rows(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        yield from csv.reader(f)
+
+# Function to sort the rows of a CSV file with an external merge sort.
+# At most chunk_rows rows are in memory at once: sorted runs are written to disk, then merged.
+def external_sort_rows(input_path, key, chunk_rows=DEFAULT_SORT_CHUNK_ROWS, tmp_dir=None):
+    run_paths = []
+    try:
+        chunk = []
+        for row in _read_rows(input_path):
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                run_paths.append(_write_sorted_run(chunk, key, tmp_dir))
+                chunk = []
+        if chunk:
+            run_paths.append(_write_sorted_run(chunk, key, tmp_dir))
+
+        yield from heapq.merge(*(_read_rows(path) for path in run_paths), key=key)
+    finally:
+        for path in run_paths:
+            os.remove(path)
@@ -0,0 +1,47 @@
+import random
+
+import numpy as np
+import pytest
+from spellchecker import SpellChecker
+
+import script
+from dictionary import MAX_WORD_LENGTH, MIN_WORD_LENGTH, WordIndex, build_word_index
+
+
+@pytest.fixture(scope='module')
+def spellchecker():
+    return SpellChecker()
+
+
+def test_index_agrees_with_spellchecker(spellchecker):
+    known = [word for word in spellchecker.word_frequency.keys()
+             if MIN_WORD_LENGTH <= len(word) <= MAX_WORD_LENGTH and word.isascii()]
+    rng = random.Random(0)
+    words = rng.sample(known, 5000)
+    # Misspellings and made-up tokens, which mostly are not words
+    words += [word[::-1] + 'q' for word in words[:2000]] + ['Tee', 'COMPANY', 'Railroad', 'xqzt', 'abs']
+    words = [word for word in words if MIN_WORD_LENGTH <= len(word) <= MAX_WORD_LENGTH]
+
+    index = script.get_word_index()
+    assert index.contains_many(words) == [word in spellchecker for word in words]
+
+
+def test_vocabulary_words_survive_the_filter():
+    assert script.filter_recognized_words("Kooskia 1503 the Railroad xqzt ab") == "Kooskia the Railroad"
+
+
+def test_filter_version_follows_the_index(tmp_path):
+    path = str(tmp_path / 'index.npy')
+    np.save(path, np.array([b'apple', b'county'], dtype=f'S{MAX_WORD_LENGTH}'))
+    first = WordIndex(path)
+    np.save(path, np.array([b'apple', b'county', b'river'], dtype=f'S{MAX_WORD_LENGTH}'))
+    second = WordIndex(path)
+    assert first.index_hash != second.index_hash
+    assert second.contains_many(['River', 'rivers', 'apple']) == [True, False, True]
+
+
+def test_built_index_is_sorted_and_loadable(tmp_path):
+    path = build_word_index(str(tmp_path / 'index.npy'))
+    words = np.load(path, mmap_mode='r')
+    assert len(words) > 10000
+    assert np.all(words[:-1] < words[1:])
@@ -0,0 +1,116 @@
+import os
+
+import script
+from ocr_cache import OCRCache
+
+
+def test_filter_versions_do_not_pile_up(tmp_path):
+    with OCRCache(str(tmp_path), max_bytes=10 * 1024) as cache:
+        cache.put('key', 'raw text', 1, 'first')
+        for version in range(2, 52):
+            cache.put_filtered('key', version, 'x' * 1024)
+
+        assert cache.get_filtered('key', 51) == 'x' * 1024
+        assert cache.get_filtered('key', 50) is None
+        assert cache.conn.execute('SELECT COUNT(*) FROM filtered').fetchone()[0] == 1
+        assert cache.total_bytes == len('raw text') + 1024
+
+
+def test_filtered_text_counts_towards_eviction(tmp_path):
+    with OCRCache(str(tmp_path), max_bytes=100) as cache:
+        cache.put('old', 'a' * 40, 1, 'b' * 40)
+        cache.put('new', 'c' * 40, 1, 'd' * 40)
+
+        assert cache.get_raw('old') is None
+        assert cache.get_filtered('old', 1) is None
+        assert cache.get_raw('new') == 'c' * 40
+        assert cache.total_bytes == 80
+
+
+def test_put_regions_evicts(tmp_path):
+    with OCRCache(str(tmp_path), max_bytes=100) as cache:
+        for i in range(10):
+            cache.put_regions(f"key{i}", [[0, 0, 1000 + i, 2000]])
+
+        assert cache.total_bytes <= 100
+        assert cache.get_regions('key9') == [[0, 0, 1009, 2000]]
+        assert cache.get_regions('key0') is None
+
+
+def test_total_bytes_survives_reopening(tmp_path):
+    with OCRCache(str(tmp_path)) as cache:
+        cache.put('key', 'raw', 1, 'filtered')
+        cache.put_regions('regions', [[1, 2, 3, 4]])
+        total = cache.total_bytes
+    with OCRCache(str(tmp_path)) as cache:
+        assert cache.total_bytes == total
+
+
+def test_checkpoint_skips_changed_files(tmp_path):
+    image = tmp_path / 'a.png'
+    image.write_bytes(b'one')
+    with OCRCache(str(tmp_path / 'cache')) as cache:
+        cache.save_checkpoint('run', str(image), ['a.png', 'No text detected'])
+        assert cache.load_checkpoint('run') == {str(image): ['a.png', 'No text detected']}
+
+        image.write_bytes(b'changed')
+        assert cache.load_checkpoint('run') == {}
+
+        cache.clear_checkpoint('run')
+        assert cache.conn.execute('SELECT COUNT(*) FROM checkpoint').fetchone()[0] == 0
+
+
+def test_interrupted_run_resumes_from_checkpoint(tmp_path, monkeypatch):
+    processed = []
+
+    def fake_process_image_file(input_image_path, regions=None):
+        processed.append(os.path.basename(input_image_path))
+        return 'raw', 'text', None, [], {'stages': {}, 'peak_rss_mb': None, 'process_peak_rss_mb': None}
+
+    monkeypatch.setattr(script, 'process_image_file', fake_process_image_file)
+    paths = []
+    for name in 'abcd':
+        path = tmp_path / f"{name}.png"
+        path.write_bytes(name.encode())
+        paths.append(str(path))
+
+    with OCRCache(str(tmp_path / 'cache')) as cache:
+        rows = script.process_image_files(paths, workers=1, cache=cache, run='run')
+        first = [next(rows), next(rows)]
+        rows.close()
+        # Drop the OCR results, so only the checkpoint can skip the finished images
+        cache.conn.execute('DELETE FROM ocr')
+
+        processed.clear()
+        resumed = list(script.process_image_files(paths, workers=1, cache=cache, run='run'))
+
+    assert processed == ['c.png', 'd.png']
+    assert resumed[:2] == first
+    assert [row[0] for row in resumed] == ['a.png', 'b.png', 'c.png', 'd.png']
+
+
+def test_resumed_run_does_not_rehash_cache_hits(tmp_path, monkeypatch):
+    def fake_process_image_file(input_image_path, regions=None):
+        return 'raw', 'text', None, [], {'stages': {}, 'peak_rss_mb': None, 'process_peak_rss_mb': None}
+
+    monkeypatch.setattr(script, 'process_image_file', fake_process_image_file)
+    paths = []
+    for name in 'abc':
+        path = tmp_path / f"{name}.png"
+        path.write_bytes(name.encode())
+        paths.append(str(path))
+
+    with OCRCache(str(tmp_path / 'cache')) as cache:
+        # An earlier run filled the cache; this run gets its rows from it and is then interrupted
+        list(script.process_image_files(paths, workers=1, cache=cache))
+        rows = script.process_image_files(paths, workers=1, cache=cache, run='run')
+        first = [next(rows), next(rows), next(rows)]
+        rows.close()
+
+        hashed = []
+        real_hash_file = script.hash_file
+        monkeypatch.setattr(script, 'hash_file', lambda path: hashed.append(path) or real_hash_file(path))
+        resumed = list(script.process_image_files(paths, workers=1, cache=cache, run='run'))
+
+    assert hashed == []
+    assert resumed == first
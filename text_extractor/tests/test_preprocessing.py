@@ -0,0 +1,78 @@
+import warnings
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+import script
+
+
+def test_image_info_ignores_the_decompression_bomb_limit(tmp_path, monkeypatch):
+    path = str(tmp_path / 'page.jpg')
+    cv2.imwrite(path, np.full((300, 400), 255, dtype=np.uint8))
+    # As if the page were far above Pillow's limit, like a 14000 x 14000 scan
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        assert script.read_image_info(path) == (400, 300, None)
+    assert Image.MAX_IMAGE_PIXELS == 1000
+
+
+def test_small_images_keep_the_upscale(tmp_path):
+    path = str(tmp_path / 'small.png')
+    cv2.imwrite(path, np.full((600, 800), 255, dtype=np.uint8))
+    assert script.choose_scale(path) == script.PREPROCESS_SCALE
+
+
+def test_large_page_is_scaled_to_the_target_dpi(tmp_path):
+    # A blank letter page at 600 dpi: no text to measure, so the stored DPI is used
+    path = str(tmp_path / 'large.png')
+    Image.fromarray(np.full((6600, 5100), 255, dtype=np.uint8)).save(path, dpi=(600, 600))
+    assert script.choose_scale(path) == pytest.approx(script.OCR_TARGET_DPI / 600, rel=1e-4)
+
+
+def test_scale_never_exceeds_the_pixel_budget(tmp_path):
+    # A 150 dpi page would be upscaled, but not past PREPROCESS_SCALE or MAX_OCR_PIXELS
+    path = str(tmp_path / 'low_dpi.png')
+    Image.fromarray(np.full((5000, 4000), 255, dtype=np.uint8)).save(path, dpi=(150, 150))
+    scale = script.choose_scale(path)
+    assert script.MIN_SCALE <= scale <= script.PREPROCESS_SCALE
+    assert 5000 * 4000 * scale ** 2 <= script.MAX_OCR_PIXELS
+
+
+@pytest.mark.parametrize('scale, shape', [(0.5, (150, 200)), (0.3, (90, 120)), (1.1, (330, 440)), (1.0, (300, 400))])
+def test_decode_grayscale_scales_the_page(tmp_path, scale, shape):
+    path = str(tmp_path / 'page.png')
+    page = np.zeros((300, 400, 3), dtype=np.uint8)
+    page[:, :200] = (255, 255, 255)
+    cv2.imwrite(path, page)
+    gray = script.decode_grayscale(path, scale)
+    assert gray.ndim == 2
+    assert gray.shape == shape
+
+
+def test_decode_grayscale_reports_unreadable_files(tmp_path):
+    path = tmp_path / 'broken.jpg'
+    path.write_bytes(b'not an image')
+    with pytest.raises(ValueError):
+        script.decode_grayscale(str(path), 1.0)
+
+
+def test_tiles_are_cut_at_the_emptiest_rows():
+    img = np.zeros((2500, 50), dtype=np.uint8)
+    img[:, ::2] = 255
+    # Rows 950 and 1900 are the only rows without ink
+    img[950] = 255
+    img[1900] = 255
+    tiles = script.split_into_tiles(img, tile_height=1000)
+
+    assert [tile.shape[0] for tile in tiles] == [950, 950, 600]
+    assert all(np.shares_memory(tile, img) for tile in tiles)
+    assert np.array_equal(np.concatenate(tiles), img)
+
+
+def test_short_pages_are_not_tiled():
+    img = np.zeros((800, 50), dtype=np.uint8)
+    tiles = script.split_into_tiles(img, tile_height=1000)
+    assert len(tiles) == 1 and tiles[0] is img
@@ -0,0 +1,30 @@
+import multiprocessing
+import os
+
+import pytest
+
+import script
+
+
+# Stand-in for process_image_file whose worker process dies on one image
+def crash_on_b(input_image_path, regions=None):
+    if os.path.basename(input_image_path) == 'b.png':
+        os._exit(1)
+    return 'some text', 'some text', None, [], {'stages': {}, 'peak_rss_mb': None, 'process_peak_rss_mb': None}
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason="the patched worker function must reach the workers")
+def test_worker_crash_only_fails_that_image(tmp_path, monkeypatch):
+    monkeypatch.setattr(script, 'process_image_file', crash_on_b)
+    paths = []
+    for name in 'abcdefgh':
+        path = tmp_path / f"{name}.png"
+        path.write_bytes(b'')
+        paths.append(str(path))
+
+    rows = list(script.process_image_files(paths, workers=2))
+
+    assert [row[0] for row in rows] == [f"{name}.png" for name in 'abcdefgh']
+    errors = [row[0] for row in rows if row[1].startswith('Error:')]
+    assert errors == ['b.png']
+    assert all(row[1] == 'includes the text: "some text"' for row in rows if row[0] != 'b.png')
@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+import pytest
+
+import benchmark
+import profiling
+from profiling import MetricsWriter, read_metrics
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/clear_refs'), reason="the peak can only be reset on Linux")
+def test_peak_memory_is_measured_per_image():
+    buffer = np.ones(200 * 1024 * 1024 // 8)
+    buffer_peak = profiling.peak_memory_mb()
+    del buffer
+
+    assert profiling.reset_peak_memory()
+    # The next image starts from the current size, not the peak of the earlier one
+    assert profiling.peak_memory_mb() < buffer_peak - 100
+    # The kernel's RSS counters are approximate, so allow a little slack
+    assert profiling.process_peak_memory_mb() >= buffer_peak - 1
+
+
+def test_metrics_round_trip(tmp_path):
+    path = str(tmp_path / 'metrics.jsonl')
+    with MetricsWriter(path) as metrics:
+        metrics.record('a.png', 'ocr', {'decode': 0.25, 'ocr': 1.5}, 120.0, 300.0)
+        metrics.record('b.png', 'cache', {'lookup': 0.01})
+        with metrics.stage('sort'):
+            pass
+
+    records, summary = read_metrics(path)
+    assert records == [
+        {'filename': 'a.png', 'source': 'ocr', 'stages': {'decode': 0.25, 'ocr': 1.5}, 'total': 1.75,
+         'peak_rss_mb': 120.0, 'process_peak_rss_mb': 300.0},
+        {'filename': 'b.png', 'source': 'cache', 'stages': {'lookup': 0.01}, 'total': 0.01,
+         'peak_rss_mb': None, 'process_peak_rss_mb': None},
+    ]
+    assert summary['images'] == 2
+    assert summary['stage_totals']['decode'] == 0.25
+    assert summary['stage_totals']['lookup'] == 0.01
+    assert 'sort' in summary['stage_totals']
+
+
+# Function to build benchmark results for one dataset
+def make_results(p50, p90, throughput):
+    return {'datasets': {'bundled_A': {'latency': {'p50': p50, 'p90': p90}, 'throughput': throughput}}}
+
+
+def test_compare_results_flags_regressions_beyond_the_threshold():
+    baseline = make_results(1.0, 2.0, 10.0)
+    assert benchmark.compare_results(make_results(1.05, 2.1, 9.6), baseline, 0.10) == []
+
+    regressions = benchmark.compare_results(make_results(1.2, 2.0, 8.0), baseline, 0.10)
+    assert regressions == ['bundled_A latency p50 +20.0%', 'bundled_A throughput -20.0%']
+
+
+def test_compare_results_skips_datasets_missing_from_the_baseline():
+    assert benchmark.compare_results(make_results(5.0, 5.0, 1.0), {'datasets': {}}, 0.10) == []
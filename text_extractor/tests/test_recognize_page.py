@@ -0,0 +1,44 @@
+import threading
+import time
+
+import script
+
+# Rank 0 is slow and below the confidence target; rank 1 reaches it; ranks 2 and 3 must not count
+STRATEGIES = [
+    {'threshold': 'otsu', 'psm': 12, 'text': 'county', 'conf': 70, 'top': 10, 'delay': 0.3},
+    {'threshold': 'adaptive', 'psm': 12, 'text': 'railroad', 'conf': 90, 'top': 50, 'delay': 0.0},
+    {'threshold': 'otsu', 'psm': 6, 'text': 'station', 'conf': 95, 'top': 90, 'delay': 0.4},
+    {'threshold': 'gray', 'psm': 11, 'text': 'river', 'conf': 95, 'top': 130, 'delay': 0.4},
+]
+
+
+def run_recognize_page(monkeypatch, threads):
+    finished = []
+    lock = threading.Lock()
+
+    def fake_run_strategy(gray, binarized, regions, strategy):
+        time.sleep(strategy['delay'])
+        with lock:
+            finished.append(strategy['text'])
+        return [{'text': strategy['text'], 'conf': float(strategy['conf']), 'left': 10, 'top': strategy['top'],
+                 'width': 80, 'height': 20, 'line': 0, 'region': 0}]
+
+    monkeypatch.setattr(script, 'run_strategy', fake_run_strategy)
+    monkeypatch.setattr(script, 'strategy_threads', threads)
+    monkeypatch.setattr(script, 'strategy_executor', None)
+    text = script.recognize_page(None, None, [[0, 0, 100, 200]], STRATEGIES)
+    with lock:
+        done_at_return = list(finished)
+    if script.strategy_executor is not None:
+        script.strategy_executor.shutdown()
+    return text, done_at_return
+
+
+def test_concurrent_strategies_match_serial_result(monkeypatch):
+    serial, serial_finished = run_recognize_page(monkeypatch, threads=1)
+    concurrent, concurrent_finished = run_recognize_page(monkeypatch, threads=4)
+
+    assert serial_finished == ['county', 'railroad']
+    assert concurrent == serial
+    # Strategies started ahead of time have finished before recognize_page returns
+    assert sorted(concurrent_finished) == sorted(['county', 'railroad', 'station', 'river'])
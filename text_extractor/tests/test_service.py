@@ -0,0 +1,107 @@
+import csv
+import os
+import threading
+import time
+
+import script
+from service import OCRService
+
+
+# Function to run the service in a thread until `until` is true, then stop it
+def run_service(service, until, timeout=10):
+    thread = threading.Thread(target=service.serve)
+    thread.start()
+    deadline = time.time() + timeout
+    while not until() and time.time() < deadline:
+        time.sleep(0.05)
+    # Give the watcher a few more scans to show nothing is queued twice
+    time.sleep(0.3)
+    service.stop()
+    thread.join(timeout)
+
+
+def test_inbox_files_are_processed_once_across_restarts(tmp_path, monkeypatch):
+    processed = []
+
+    def fake_process_image_file(input_image_path, regions=None):
+        processed.append(os.path.basename(input_image_path))
+        if input_image_path.endswith('broken.png'):
+            return None, None, 'cannot decode', None, {'stages': {}, 'peak_rss_mb': None, 'process_peak_rss_mb': None}
+        return 'raw', 'text', None, [], {'stages': {}, 'peak_rss_mb': None, 'process_peak_rss_mb': None}
+
+    monkeypatch.setattr(script, 'process_image_file', fake_process_image_file)
+    inbox = tmp_path / 'inbox'
+    inbox.mkdir()
+    for name in ('a.png', 'b.png', 'broken.png'):
+        (inbox / name).write_bytes(name.encode())
+    output = tmp_path / 'output'
+
+    service = OCRService(str(output), 'transcriptions.csv', inbox=str(inbox), workers=1, poll_interval=0.05)
+    run_service(service, lambda: service.processed >= 3)
+    assert sorted(processed) == ['a.png', 'b.png', 'broken.png']
+    assert service.active == set()
+
+    # A restarted service skips what is done, including the failed file, and picks up new or changed files
+    processed.clear()
+    (inbox / 'c.png').write_bytes(b'c')
+    (inbox / 'a.png').write_bytes(b'changed')
+    service = OCRService(str(output), 'transcriptions.csv', inbox=str(inbox), workers=1, poll_interval=0.05)
+    run_service(service, lambda: service.processed >= 2)
+    assert sorted(processed) == ['a.png', 'c.png']
+
+    with open(output / 'transcriptions.csv', newline='', encoding='utf-8-sig') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['Filename', 'Transcribed Text']
+    assert sorted(row[0] for row in rows[1:]) == ['a.png', 'a.png', 'b.png', 'broken.png', 'c.png']
+
+
+def test_cached_inbox_files_are_written_once(tmp_path, monkeypatch):
+    processed = []
+
+    def fake_process_image_file(input_image_path, regions=None):
+        processed.append(os.path.basename(input_image_path))
+        return 'raw', 'text', None, [], {'stages': {}, 'peak_rss_mb': None, 'process_peak_rss_mb': None}
+
+    monkeypatch.setattr(script, 'process_image_file', fake_process_image_file)
+    inbox = tmp_path / 'inbox'
+    inbox.mkdir()
+    (inbox / 'a.png').write_bytes(b'same scan')
+    (inbox / 'copy_of_a.png').write_bytes(b'same scan')
+    output = tmp_path / 'output'
+
+    service = OCRService(str(output), 'transcriptions.csv', inbox=str(inbox), workers=1, poll_interval=0.05)
+    run_service(service, lambda: service.processed >= 2)
+    # The copy comes from the OCR cache, and is not queued again on later scans
+    assert len(processed) == 1
+    assert service.processed == 2
+
+    # A touched file is read again (from the cache) once
+    stat = os.stat(inbox / 'a.png')
+    os.utime(inbox / 'a.png', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    service = OCRService(str(output), 'transcriptions.csv', inbox=str(inbox), workers=1, poll_interval=0.05)
+    run_service(service, lambda: service.processed >= 1)
+    assert len(processed) == 1
+    assert service.processed == 1
+
+    with open(output / 'transcriptions.csv', newline='', encoding='utf-8-sig') as f:
+        rows = list(csv.reader(f))
+    assert sorted(row[0] for row in rows[1:]) == ['a.png', 'a.png', 'copy_of_a.png']
+
+
+def test_stable_file_is_queued_as_soon_as_the_queue_drains(tmp_path):
+    inbox = tmp_path / 'inbox'
+    inbox.mkdir()
+    (inbox / 'a.png').write_bytes(b'a')
+    service = OCRService(str(tmp_path / 'output'), 'transcriptions.csv', inbox=str(inbox), queue_size=1, poll_interval=0.2)
+    service.submit('placeholder')
+    watcher = threading.Thread(target=service.watch_inbox)
+    watcher.start()
+    try:
+        # The file is stable but the queue is full for a few scans
+        time.sleep(0.7)
+        assert service.jobs.get_nowait() == 'placeholder'
+        # It is queued on the next scan, without being treated as a new file again
+        assert service.jobs.get(timeout=0.35) == str(inbox / 'a.png')
+    finally:
+        service.stop()
+        watcher.join()
@@ -0,0 +1,77 @@
+import csv
+import json
+import os
+import tempfile
+
+from script import row_sort_key
+from streaming import RowWriter, external_sort_rows, iter_image_files
+
+
+def test_external_sort_merges_several_runs(tmp_path, monkeypatch):
+    names = [f"{prefix}_{i}.png" for i in range(25) for prefix in ('b', 'A', 'c', 'a')]
+    rows = [[name, f'includes the text: "{i}"'] for i, name in enumerate(names)]
+    spool = tmp_path / 'rows.partial'
+    with RowWriter(str(spool)) as writer:
+        for row in rows:
+            writer.write(row)
+
+    run_dir = tmp_path / 'runs'
+    run_dir.mkdir()
+    created = []
+
+    def tracking_mkstemp(*args, **kwargs):
+        fd, path = real_mkstemp(*args, **kwargs)
+        created.append(path)
+        return fd, path
+
+    real_mkstemp = tempfile.mkstemp
+    monkeypatch.setattr(tempfile, 'mkstemp', tracking_mkstemp)
+    merged = list(external_sort_rows(str(spool), key=row_sort_key, chunk_rows=7, tmp_dir=str(run_dir)))
+
+    assert len(created) == 15
+    assert merged == sorted(rows, key=row_sort_key)
+    assert os.listdir(run_dir) == []
+
+
+def test_external_sort_removes_runs_when_stopped_early(tmp_path):
+    spool = tmp_path / 'rows.partial'
+    with RowWriter(str(spool)) as writer:
+        for i in range(20):
+            writer.write([f"{i:02d}.png", 'No text detected'])
+
+    run_dir = tmp_path / 'runs'
+    run_dir.mkdir()
+    rows = external_sort_rows(str(spool), key=row_sort_key, chunk_rows=3, tmp_dir=str(run_dir))
+    assert next(rows)[0] == '00.png'
+    assert os.listdir(run_dir)
+    rows.close()
+    assert os.listdir(run_dir) == []
+
+
+def test_row_writer_appends_with_header_once(tmp_path):
+    spool = tmp_path / 'rows.csv'
+    jsonl = tmp_path / 'rows.jsonl'
+    header = ['Filename', 'Transcribed Text']
+    with RowWriter(str(spool), str(jsonl), append=True, header=header) as writer:
+        writer.write(['a.png', 'includes the text: "one"'])
+    with RowWriter(str(spool), str(jsonl), append=True, header=header) as writer:
+        writer.write(['b.png', 'No text detected'])
+
+    with open(spool, newline='', encoding='utf-8') as f:
+        assert list(csv.reader(f)) == [header, ['a.png', 'includes the text: "one"'], ['b.png', 'No text detected']]
+    with open(jsonl, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert records == [
+        {'filename': 'a.png', 'transcribed_text': 'includes the text: one'},
+        {'filename': 'b.png', 'transcribed_text': 'No text detected'},
+    ]
+
+
+def test_iter_image_files_walks_subfolders_in_order(tmp_path):
+    for relative in ('b.PNG', 'a.jpg', 'notes.txt', 'sub/c.tiff', '.hidden/d.png'):
+        path = tmp_path / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'')
+
+    found = [os.path.relpath(path, tmp_path) for path in iter_image_files(str(tmp_path))]
+    assert found == ['a.jpg', 'b.PNG', os.path.join('sub', 'c.tiff')]
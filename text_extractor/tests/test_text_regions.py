@@ -0,0 +1,68 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+import script
+from text_regions import detect_text_regions, merge_overlapping
+
+BUNDLED_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'A')
+
+
+# Function to tell whether two [x, y, width, height] boxes share any pixels
+def boxes_overlap(a, b):
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+# Function to draw lines of text on a page; `dark` text on a light page, or light text on a dark sign
+def draw_text(page, lines, top, color, scale=1.0):
+    for i, line in enumerate(lines):
+        cv2.putText(page, line, (60, top + i * int(45 * scale)), cv2.FONT_HERSHEY_SIMPLEX, scale, color, 2)
+
+
+def test_blank_page_has_no_regions():
+    page = np.full((800, 600), 255, dtype=np.uint8)
+    assert detect_text_regions(script.binarize(page, 'otsu')) == []
+
+
+def test_dark_text_is_cropped_to_its_regions():
+    page = np.full((1600, 1200), 235, dtype=np.uint8)
+    draw_text(page, ["the county railroad station", "written account of the river", "several printed records"], 200, 20)
+    regions = detect_text_regions(script.binarize(page, 'otsu'))
+
+    assert regions and regions != [[0, 0, 1200, 1600]]
+    assert all(y < 400 for _, y, _, _ in regions)
+
+
+def test_light_text_on_a_dark_sign_is_found():
+    page = np.full((1600, 1200), 235, dtype=np.uint8)
+    draw_text(page, ["the county railroad station", "written account of the river", "several printed records"], 200, 20)
+    cv2.rectangle(page, (40, 900), (700, 1100), 30, -1)
+    draw_text(page, ["COMPANY 1503", "ROAD UNDER CONSTRUCTION"], 970, 230)
+    regions = detect_text_regions(script.binarize(page, 'otsu'))
+
+    # Both lines of the sign (baselines at y 970 and 1015) are inside a region
+    assert any(y <= 955 and y + h >= 970 for _, y, _, h in regions)
+    assert any(y <= 1000 and y + h >= 1015 for _, y, _, h in regions)
+
+
+def test_weak_detection_reads_the_whole_page():
+    page = np.full((1600, 1200), 235, dtype=np.uint8)
+    draw_text(page, ["CCC"], 800, 20)
+    assert detect_text_regions(script.binarize(page, 'otsu')) == [[0, 0, 1200, 1600]]
+
+
+def test_merge_overlapping_joins_nested_and_chained_boxes():
+    boxes = [[0, 0, 100, 100], [10, 10, 20, 20], [90, 90, 30, 30], [200, 0, 10, 10], [210, 0, 10, 10]]
+    assert sorted(merge_overlapping(boxes)) == [[0, 0, 120, 120], [200, 0, 10, 10], [210, 0, 10, 10]]
+
+
+@pytest.mark.parametrize('name', ['cccidaho1968.jpg', 'cccidaho712.jpg', 'cccidaho725.jpg', 'phs377.jpg', 'phs429.jpg',
+                                  'ug135-scrapbook1-page6.jpg'])
+def test_regions_of_bundled_images_are_disjoint(name):
+    regions = detect_text_regions(script.binarize(script.load_grayscale(os.path.join(BUNDLED_FOLDER, name)), 'otsu'))
+    assert regions
+    for i, a in enumerate(regions):
+        for b in regions[i + 1:]:
+            assert not boxes_overlap(a, b)
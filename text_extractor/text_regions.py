@@ -0,0 +1,145 @@
+import cv2
+import numpy as np
+
+# Settings for the text-region detection pass; they are part of the OCR cache key
+MIN_CHAR_HEIGHT = 6
+MIN_CHARS_PER_REGION = 3
+REGION_PADDING = 8
+# Above this many regions, or this share of the page, it is cheaper to OCR the whole page
+MAX_TEXT_REGIONS = 12
+MAX_REGION_COVERAGE = 0.6
+# Below this many letters, or this share of the page, detection is too unsure to crop to its regions
+MIN_LETTERS_TO_CROP = 30
+MIN_REGION_COVERAGE = 0.01
+
+DETECTION_SETTINGS = {
+    'min_char_height': MIN_CHAR_HEIGHT,
+    'min_chars_per_region': MIN_CHARS_PER_REGION,
+    'padding': REGION_PADDING,
+    'max_regions': MAX_TEXT_REGIONS,
+    'max_coverage': MAX_REGION_COVERAGE,
+    'min_letters_to_crop': MIN_LETTERS_TO_CROP,
+    'min_coverage': MIN_REGION_COVERAGE,
+    'polarities': ['dark', 'light'],
+    'merge_overlapping': True,
+}
+
+
+# Function to find the letter-like connected components of a binarized page: black text on white,
+# or with `inverse`, white text on black (painted signs, captions on dark prints).
+# Returns their boxes as an (n, 4) array of x, y, width, height.
+def find_letter_boxes(img, inverse=False):
+    ink = img if inverse else cv2.bitwise_not(img)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    stats = stats[1:]
+    widths = stats[:, cv2.CC_STAT_WIDTH]
+    heights = stats[:, cv2.CC_STAT_HEIGHT]
+    fill = stats[:, cv2.CC_STAT_AREA] / np.maximum(widths * heights, 1)
+
+    # Letters are small, not much wider than tall, and neither hairlines nor solid blocks
+    letters = (
+        (heights >= MIN_CHAR_HEIGHT)
+        & (heights <= max(img.shape[0] // 8, MIN_CHAR_HEIGHT))
+        & (widths <= heights * 5)
+        & (fill >= 0.1)
+        & (fill <= 0.95)
+    )
+    return stats[letters, :4]
+
+# Function to order region boxes for reading: top to bottom in lines, then left to right
+def sort_regions(regions, line_height):
+    band = max(int(line_height), 1)
+    return sorted(regions, key=lambda box: (box[1] // band, box[0]))
+
+# Function to merge boxes that overlap into the box around both, until no two boxes overlap.
+# Each region is read on its own, so text inside two overlapping regions would be read twice.
+def merge_overlapping(boxes):
+    boxes = [list(box) for box in boxes]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                ax, ay, aw, ah = boxes[i]
+                bx, by, bw, bh = boxes[j]
+                if ax < bx + bw and bx < ax + aw and ay < by + bh and by < ay + ah:
+                    x0, y0 = min(ax, bx), min(ay, by)
+                    x1, y1 = max(ax + aw, bx + bw), max(ay + ah, by + bh)
+                    boxes[i] = [x0, y0, x1 - x0, y1 - y0]
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return boxes
+
+# Function to join letter boxes into lines and blocks with a morphological close.
+# Returns the padded [x, y, width, height] boxes of the blocks holding enough letters to be text
+# rather than speckle, and the number of letters in each.
+def group_letters(letters, shape):
+    if len(letters) < MIN_CHARS_PER_REGION:
+        return [], []
+
+    # Paint the letter boxes into a mask and join neighbouring letters into lines and blocks
+    mask = np.zeros(shape, dtype=np.uint8)
+    for x, y, w, h in letters:
+        mask[y:y + h, x:x + w] = 255
+    char_height = int(np.median(letters[:, 3]))
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (char_height * 3, max(char_height // 2, 1)))
+    cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, dst=mask)
+
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    centers_x = letters[:, 0] + letters[:, 2] // 2
+    centers_y = letters[:, 1] + letters[:, 3] // 2
+    letters_per_blob = np.bincount(labels[centers_y, centers_x], minlength=count)
+
+    page_height, page_width = shape
+    blocks, counts = [], []
+    for label in range(1, count):
+        if letters_per_blob[label] < MIN_CHARS_PER_REGION:
+            continue
+        x, y, w, h = (int(v) for v in stats[label, :4])
+        x0, y0 = max(x - REGION_PADDING, 0), max(y - REGION_PADDING, 0)
+        x1, y1 = min(x + w + REGION_PADDING, page_width), min(y + h + REGION_PADDING, page_height)
+        blocks.append([x0, y0, x1 - x0, y1 - y0])
+        counts.append(int(letters_per_blob[label]))
+    return blocks, counts
+
+# Function to detect the regions of a binarized page that are likely to contain text, dark on light
+# or light on dark. Returns a list of non-overlapping [x, y, width, height] boxes in reading order, [] for a page with
+# no text of either kind, or one box covering the page when text is spread over too much of it to be
+# worth cropping, or when too little was found to trust the regions.
+def detect_text_regions(img):
+    page_height, page_width = img.shape
+    dark_letters = find_letter_boxes(img)
+    regions, counts = group_letters(dark_letters, img.shape)
+
+    # The holes of dark letters (o, e, a) look like light letters; only keep light letters outside dark text
+    light_letters = find_letter_boxes(img, inverse=True)
+    if regions and len(light_letters):
+        in_dark_text = np.zeros(img.shape, dtype=bool)
+        for x, y, w, h in regions:
+            in_dark_text[y:y + h, x:x + w] = True
+        centers_x = light_letters[:, 0] + light_letters[:, 2] // 2
+        centers_y = light_letters[:, 1] + light_letters[:, 3] // 2
+        light_letters = light_letters[~in_dark_text[centers_y, centers_x]]
+    light_regions, light_counts = group_letters(light_letters, img.shape)
+    regions += light_regions
+    counts += light_counts
+    if not regions:
+        return []
+
+    # The number of text blocks found is a sign of how cluttered the page is, so it is counted before
+    # overlapping blocks are merged; the coverage is that of the merged boxes, without double counting
+    block_count = len(regions)
+    regions = merge_overlapping(regions)
+    full_page = [[0, 0, page_width, page_height]]
+    covered = sum(w * h for _, _, w, h in regions)
+    if block_count > MAX_TEXT_REGIONS or covered > MAX_REGION_COVERAGE * page_width * page_height:
+        return full_page
+    # A few letters, or a sliver of the page, usually means text the detector could not make out
+    # (handwriting, worn signs) rather than a page with only that much text
+    if sum(counts) < MIN_LETTERS_TO_CROP or covered < MIN_REGION_COVERAGE * page_width * page_height:
+        return full_page
+    char_height = int(np.median(np.concatenate([dark_letters, light_letters])[:, 3]))
+    return sort_regions(regions, char_height * 2)